@@ -2,6 +2,17 @@ from flask import Flask, render_template, request, redirect, url_for, jsonify
 from flask_pymongo import PyMongo
 from flask_login import LoginManager, current_user
 from utils.mailer import mail
+from utils.menu_cache import menu_cache, EMPTY_MENU
+from utils.view_counter import view_counter
+from utils.pagination import announcement_counts
+from utils.cache_versions import announcements_version, views_version
+from utils.announcement_cache import announcement_cache
+from utils.helpers import lazy_request_value
+from utils.session_store import init_session_interface
+from utils.indexes import sync_on_startup
+from utils.counters import delete_users
+from utils.hashing import hashing_pool
+from utils.passwords import password_hasher
 from config import Config
 import os
 import logging
@@ -32,98 +43,37 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 mongo = PyMongo(app)
 app.mongo = mongo
 mail.init_app(app)
+menu_cache.init_app(app)
+view_counter.init_app(app)
+announcement_counts.init_app(app)
+announcements_version.init_app(app)
+views_version.init_app(app)
+announcement_cache.init_app(app)
+view_counter.add_listener(announcement_cache.apply_views)
+view_counter.add_listener(lambda counts: views_version.bump(mongo))
+init_session_interface(app, mongo)
+sync_on_startup(app)
 
 
 def get_dynamic_menu():
-    """获取动态菜单数据"""
+    """获取动态菜单数据（当前用户访问级别对应的只读快照）"""
     try:
         if not hasattr(app, 'mongo'):
-            return {'primary': [], 'secondary': {}}
-
-        # 获取所有激活且显示在菜单中的功能
-        functions = list(app.mongo.db.dynamic_functions.find({
-            'is_active': True,
-            'show_in_menu': True
-        }).sort('menu_order', 1))
-
-        # 组织菜单结构
-        menu_structure = {
-            'primary': [],  # 一级菜单
-            'secondary': {}  # 二级菜单分组
-        }
-
-        for func in functions:
-            func['_id'] = str(func['_id'])
-
-            if func['menu_level'] == 1:  # 一级菜单
-                # 检查权限
-                if check_function_access(func, current_user):
-                    menu_structure['primary'].append(func)
-            elif func['menu_level'] == 2:  # 二级菜单
-                parent_id = func.get('parent_id')
-                if parent_id:
-                    parent_id_str = str(parent_id) if isinstance(parent_id, ObjectId) else parent_id
-                    if parent_id_str not in menu_structure['secondary']:
-                        menu_structure['secondary'][parent_id_str] = []
+            return EMPTY_MENU
 
-                    # 检查权限
-                    if check_function_access(func, current_user):
-                        menu_structure['secondary'][parent_id_str].append(func)
-
-        return menu_structure
+        return menu_cache.get_menu(app.mongo, current_user)
 
     except Exception as e:
         logger.error(f"获取动态菜单失败: {e}")
-        return {'primary': [], 'secondary': {}}
-
-
-def check_function_access(function_config, user):
-    """检查用户是否有权限访问功能"""
-    if not function_config.get('is_active', True):
-        return False
-
-    access_level = function_config.get('access_level', 'verified')
-
-    # 公开访问
-    if access_level == 'public' or function_config.get('is_public', False):
-        return True
-
-    # 需要登录
-    if not user or not user.is_authenticated:
-        return False
-
-    # 所有登录用户
-    if access_level == 'all_users':
-        return True
-
-    # 需要验证邮箱
-    if access_level == 'verified':
-        return hasattr(user, 'email_verified') and user.email_verified
-
-    # 仅管理员
-    if access_level == 'admin':
-        return hasattr(user, 'is_admin') and user.is_admin
-
-    # 自定义角色/权限（后续扩展）
-    if access_level == 'custom':
-        required_roles = function_config.get('required_roles', [])
-        required_perms = function_config.get('required_perms', [])
-
-        if not required_roles and not required_perms:
-            return True
-
-        # 这里可以扩展角色和权限检查逻辑
-        return True
-
-    return False
+        return EMPTY_MENU
 
 
 @app.context_processor
 def inject_global_variables():
-    """向所有模板注入全局变量"""
+    """向所有模板注入全局变量（菜单为惰性代理，模板用到时才计算，同一请求内只计算一次）"""
     return {
         'current_year': datetime.now().year,
-        'dynamic_menu': get_dynamic_menu(),
+        'dynamic_menu': lazy_request_value('dynamic_menu', get_dynamic_menu),
         'app_name': 'MyWeb'
     }
 
@@ -154,11 +104,11 @@ def cleanup_unverified_users_on_startup():
             logger.info("启动清理：没有需要清理的未验证用户")
             return 0
 
-        # 执行删除
-        result = mongo.db.users.delete_many(query)
+        # 执行删除（同时更新用户计数器）
+        deleted_count = delete_users(mongo.db, query)
+        user_cache.clear()
 
         # 记录结果
-        deleted_count = result.deleted_count
 
         if deleted_count > 0:
             logger.info(f"✅ 启动清理：成功删除了 {deleted_count} 个超过7天未验证的用户")
@@ -182,7 +132,11 @@ def cleanup_unverified_users_on_startup():
 
 
 # 5. 用户加载器
-from models.user import User
+from models.user import User, user_cache
+
+user_cache.init_app(app)
+password_hasher.init_app(app)
+hashing_pool.init_app(app)
 
 
 @login_manager.user_loader
@@ -206,6 +160,11 @@ app.register_blueprint(admin_bp, url_prefix='/admin')
 app.register_blueprint(announcements_bp)  # 公告系统
 app.register_blueprint(dynamic_bp)  # 动态功能路由
 
+# 蓝图注册完成后编译静态菜单（排序、解析URL、按权限过滤）
+from config.admin_menu import compile_menus
+
+compile_menus(app)
+
 # 7. 注册错误处理器
 from routes.main import page_not_found, internal_server_error
 
@@ -51,11 +51,11 @@ def run_cleanup():
                 logger.info("没有需要清理的用户")
                 return 0
 
-            # 执行删除
-            result = mongo.db.users.delete_many(query)
+            # 执行删除（同时更新用户计数器）
+            from utils.counters import delete_users
+            deleted_count = delete_users(mongo.db, query)
 
             # 记录结果
-            deleted_count = result.deleted_count
             if deleted_count > 0:
                 logger.info(f"✅ 清理完成，删除了 {deleted_count} 个超过7天未验证的用户")
 
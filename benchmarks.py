@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+"""
+MyWeb 性能基准脚本
+用法: python benchmarks.py <名称>
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _timeit(func, repeat=5):
+    """返回多次运行中的最短耗时（毫秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_menu_tree():
+    """菜单树构建：旧版逐个扫描父级列表 vs 按ID索引单次遍历"""
+    from bson import ObjectId
+    from utils.menu_cache import build_menu_tree, ACCESS_CLASSES
+
+    def make_functions(count):
+        functions = []
+        parents = []
+        for i in range(count):
+            func_id = ObjectId()
+            if i % 4 == 0 or not parents:
+                func = {'_id': str(func_id), 'title': f'菜单{i}', 'menu_level': 1,
+                        'menu_order': i, 'access_level': 'verified', 'is_active': True}
+                parents.append(func_id)
+            else:
+                func = {'_id': str(func_id), 'title': f'子菜单{i}', 'menu_level': 2,
+                        'menu_order': i, 'access_level': 'verified', 'is_active': True,
+                        'parent_id': parents[i % len(parents)]}
+            functions.append(func)
+        return functions
+
+    def legacy_access(func, user):
+        # 旧版 middleware/dynamic_menu.py 的 check_function_access
+        access_level = func.get('access_level', 'auth')
+        if access_level == 'public':
+            return True
+        if not user.is_authenticated:
+            return False
+        if access_level == 'all':
+            return True
+        if access_level == 'verified' and user.email_verified:
+            return True
+        if access_level == 'admin' and user.is_admin:
+            return True
+        return False
+
+    def legacy_build(functions, user):
+        # 与旧版 get_dynamic_menu 相同的代码路径（数据库查询除外）：
+        # 逐个转换ID、检查权限，二级菜单扫描全部一级菜单查找父级，最后生成菜单组
+        menu_data = {'dynamic_functions': [], 'primary_menu': [], 'menu_groups': []}
+        for func in functions:
+            func = dict(func)
+            func['_id'] = str(func['_id'])
+            if not legacy_access(func, user):
+                continue
+
+            menu_data['dynamic_functions'].append(func)
+            if func['menu_level'] == 1:
+                menu_data['primary_menu'].append(func)
+            elif func['menu_level'] == 2:
+                for primary in menu_data['primary_menu']:
+                    if primary['_id'] == str(func.get('parent_id')):
+                        if 'children' not in primary:
+                            primary['children'] = []
+                        primary['children'].append(func)
+                        primary['has_children'] = True
+
+        for item in menu_data['primary_menu']:
+            if item.get('has_children'):
+                menu_data['menu_groups'].append({
+                    'id': item['_id'],
+                    'title': item['title'],
+                    'icon': item.get('icon', ''),
+                    'items': item.get('children', [])
+                })
+        return menu_data
+
+    profile = ACCESS_CLASSES['verified']
+    print(f"{'功能数':>8} {'旧版(ms)':>12} {'索引版(ms)':>12} {'索引版/功能(us)':>16}")
+    for count in (500, 1000, 2000, 4000, 8000):
+        functions = make_functions(count)
+        legacy_ms = _timeit(lambda: legacy_build(functions, profile))
+        indexed_ms = _timeit(lambda: build_menu_tree(functions, profile))
+        print(f"{count:>8} {legacy_ms:>12.2f} {indexed_ms:>12.2f} {indexed_ms * 1000 / count:>16.2f}")
+
+
+def _bench_db():
+    """基准测试使用的数据库（MONGO_URI 指向的库名加 _bench 后缀，不影响业务数据）"""
+    from pymongo import MongoClient
+    from config.config import Config
+
+    client = MongoClient(Config.MONGO_URI)
+    return client[client.get_default_database().name + '_bench']
+
+
+def bench_keyset_pagination():
+    """公告分页：skip 分页 vs 游标分页，第1页到第1000页的单页耗时
+
+    需要可连接的MongoDB；首次运行会在 bench_announcements 集合中生成
+    BENCH_ANNOUNCEMENTS（默认100万）条公告。
+    """
+    from datetime import datetime, timedelta
+    from bson import ObjectId
+    from utils.pagination import ANNOUNCEMENT_SORT, keyset_paginate, encode_cursor
+
+    total = int(os.environ.get('BENCH_ANNOUNCEMENTS', 1000000))
+    per_page = 15
+    query = {'status': 'published'}
+    collection = _bench_db().bench_announcements
+
+    if collection.estimated_document_count() != total:
+        print(f"生成 {total} 条测试公告...")
+        collection.drop()
+        start_time = datetime(2020, 1, 1)
+        batch = []
+        for i in range(total):
+            batch.append({
+                '_id': ObjectId(),
+                'title': f'公告{i}',
+                'summary': '摘要' * 20,
+                'status': 'published' if i % 10 else 'draft',
+                'is_pinned': i % 1000 == 0,
+                'publish_time': start_time + timedelta(seconds=i),
+                'view_count': 0
+            })
+            if len(batch) == 10000:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+
+    collection.create_index([('status', 1), ('is_pinned', -1), ('publish_time', -1), ('_id', -1)],
+                            name='status_keyset_idx')
+
+    def skip_page(page):
+        return list(collection.find(query).sort(list(ANNOUNCEMENT_SORT))
+                    .skip((page - 1) * per_page).limit(per_page))
+
+    print(f"{'页码':>8} {'skip(ms)':>12} {'游标(ms)':>12}")
+    for page in (1, 10, 100, 500, 1000):
+        cursor = None
+        if page > 1:
+            # 用上一页最后一条生成游标（不计入耗时）
+            last = skip_page(page - 1)[-1]
+            cursor = encode_cursor('next', [last.get(field) for field, _ in ANNOUNCEMENT_SORT], page)
+
+        skip_ms = _timeit(lambda: skip_page(page))
+        keyset_ms = _timeit(lambda: keyset_paginate(collection, query, ANNOUNCEMENT_SORT, per_page,
+                                                    cursor=cursor))
+        print(f"{page:>8} {skip_ms:>12.2f} {keyset_ms:>12.2f}")
+
+
+def bench_search():
+    """公告搜索：N-gram 倒排索引在 BENCH_SEARCH_ANNOUNCEMENTS（默认10万）条公告上的查询耗时
+
+    需要可连接的MongoDB；首次运行会生成公告并重建 announcement_terms 索引。
+    """
+    import random
+    from utils import search_index
+
+    total = int(os.environ.get('BENCH_SEARCH_ANNOUNCEMENTS', 100000))
+    db = _bench_db()
+
+    words = ['系统', '维护', '通知', '会议', '培训', '安全', '升级', '服务', '考试', '假期',
+             '活动', '报名', '网络', '数据', '中心', '管理', '规定', '发布', '调整', '时间']
+    random.seed(1)
+
+    if db.announcements.estimated_document_count() != total:
+        print(f"生成 {total} 条测试公告并重建索引...")
+        db.announcements.drop()
+        batch = []
+        for i in range(total):
+            batch.append({
+                'title': ''.join(random.sample(words, 3)) + f'第{i}号',
+                'plain_text': '，'.join(''.join(random.sample(words, 4)) for _ in range(3)),
+                'status': 'published'
+            })
+            if len(batch) == 10000:
+                db.announcements.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            db.announcements.insert_many(batch, ordered=False)
+        search_index.rebuild_index(db)
+
+    print(f"{'关键词':>10} {'结果数':>8} {'耗时(ms)':>10}")
+    for keyword in ('系统维护', '会议', '安全升级通知', '假', '第12345号', '不存在的词'):
+        results = search_index.search(db, keyword)
+        elapsed = _timeit(lambda: search_index.search(db, keyword))
+        print(f"{keyword:>10} {len(results):>8} {elapsed:>10.2f}")
+
+
+def bench_user_stats():
+    """用户统计：6 次 count_documents vs 一次 $facet 聚合 vs 读取计数器文档
+
+    需要可连接的MongoDB；首次运行会在 bench_users 集合中生成 BENCH_USERS（默认100万）个用户。
+    """
+    from datetime import datetime
+    from utils.user_stats import compute_user_stats
+
+    total = int(os.environ.get('BENCH_USERS', 1000000))
+    db = _bench_db()
+    collection = db.bench_users
+
+    if collection.estimated_document_count() != total:
+        print(f"生成 {total} 个测试用户...")
+        collection.drop()
+        batch = []
+        for i in range(total):
+            batch.append({
+                'username': f'user{i}',
+                'email': f'user{i}@example.com',
+                'email_verified': i % 5 != 0,
+                'is_admin': i % 1000 == 0,
+                'is_active': i % 20 != 0,
+                'created_at': datetime(2020, 1, 1)
+            })
+            if len(batch) == 10000:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+
+    def count_each():
+        return {
+            'total': collection.count_documents({}),
+            'verified': collection.count_documents({'email_verified': True}),
+            'unverified': collection.count_documents({'email_verified': False}),
+            'admins': collection.count_documents({'is_admin': True}),
+            'active': collection.count_documents({'is_active': True}),
+            'inactive': collection.count_documents({'is_active': False})
+        }
+
+    assert count_each() == compute_user_stats(collection)
+
+    # 计数器文档（与 utils.counters 中的 'users' 文档结构相同）
+    db.bench_counters.replace_one({'_id': 'users'}, compute_user_stats(collection), upsert=True)
+
+    print(f"{'方式':>16} {'耗时(ms)':>10}")
+    print(f"{'count_documents':>16} {_timeit(count_each, repeat=3):>10.2f}")
+    print(f"{'$facet':>16} {_timeit(lambda: compute_user_stats(collection), repeat=3):>10.2f}")
+    print(f"{'计数器文档':>16} {_timeit(lambda: db.bench_counters.find_one({'_id': 'users'})):>10.2f}")
+
+
+def bench_user_search():
+    """用户搜索：不区分大小写的非锚定 $regex vs 搜索键（前缀索引 + 三元组索引）
+
+    需要可连接的MongoDB；首次运行会在基准库加 _users 后缀的库中生成 BENCH_USERS（默认100万）个带搜索键的用户。
+    """
+    import random
+    from utils import user_search
+    from utils.indexes import INDEXES, sync_collection
+
+    total = int(os.environ.get('BENCH_USERS', 1000000))
+    # search_user_ids 查询 db.users，使用单独的库
+    bench_db = _bench_db()
+    db = bench_db.client[bench_db.name + '_users']
+    random.seed(1)
+    syllables = ['li', 'wang', 'zhang', 'chen', 'yang', 'zhao', 'wu', 'zhou', 'xu', 'sun', 'ma', 'hu']
+
+    if db.users.estimated_document_count() != total:
+        print(f"生成 {total} 个测试用户...")
+        db.users.drop()
+        batch = []
+        for i in range(total):
+            username = ''.join(random.sample(syllables, 2)) + str(i)
+            email = f'{username}@example.com'
+            batch.append(dict(user_search.search_fields(username, email), username=username, email=email))
+            if len(batch) == 10000:
+                db.users.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            db.users.insert_many(batch, ordered=False)
+    sync_collection(db.users, INDEXES['users'])
+
+    def regex_search(keyword):
+        return list(db.users.find({'$or': [
+            {'username': {'$regex': keyword, '$options': 'i'}},
+            {'email': {'$regex': keyword, '$options': 'i'}}
+        ]}, {'_id': 1}).limit(20))
+
+    print(f"{'关键词':>14} {'结果数':>8} {'$regex(ms)':>12} {'搜索键(ms)':>12}")
+    for keyword in ('wangli', 'zhao12345', '123456', 'xusun99999@exa', 'nobody'):
+        results = user_search.search_user_ids(db, keyword)
+        regex_ms = _timeit(lambda: regex_search(keyword), repeat=3)
+        search_ms = _timeit(lambda: user_search.search_user_ids(db, keyword))
+        print(f"{keyword:>14} {len(results):>8} {regex_ms:>12.2f} {search_ms:>12.2f}")
+
+
+BENCHMARKS = {
+    'menu': bench_menu_tree,
+    'pagination': bench_keyset_pagination,
+    'search': bench_search,
+    'user_stats': bench_user_stats,
+    'user_search': bench_user_search,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ 未知的基准: {name}（可选: {', '.join(BENCHMARKS)}）")
+            continue
+        print(f"\n=== {name} ===")
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,11 @@
 支持一级菜单和两级菜单混合使用
 """
 
+import logging
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
 # ==================== 管理员菜单配置 ====================
 ADMIN_MENU_ITEMS = [
     # 一级菜单
@@ -237,17 +242,105 @@ PUBLIC_MENU = [
 ]
 
 
+# ==================== 菜单编译 ====================
+# 上面的配置在应用启动时编译一次：按 order 排序、提前解析 url_for、按权限级别过滤，
+# 结果为只读结构（tuple + MappingProxyType），渲染侧边栏时无需再分配对象或构建URL，
+# 多线程并发读取也是安全的。
+# URL 按应用配置的 SERVER_NAME、APPLICATION_ROOT（部署在子路径下时须与 SCRIPT_NAME 一致）解析。
+
+PERMISSION_LEVELS = {
+    'public': 0,
+    'user': 1,
+    'admin': 2
+}
+
+_compiled_menus = {}
+
+
+def _resolve_url(endpoint):
+    """解析菜单项URL，'#' 或无法解析的端点返回 '#'"""
+    from flask import url_for
+    from werkzeug.routing import BuildError
+
+    if not endpoint or endpoint == '#':
+        return '#'
+    try:
+        return url_for(endpoint)
+    except BuildError:
+        logger.warning(f"菜单端点无法解析: {endpoint}")
+        return '#'
+
+
+def _compile_item(item):
+    compiled = dict(item)
+    compiled['endpoint'] = item.get('endpoint', '#')
+    compiled['url'] = _resolve_url(compiled['endpoint'])
+    if 'children' in item:
+        compiled['children'] = tuple(_compile_item(child) for child in item['children'])
+    return MappingProxyType(compiled)
+
+
+def _compile_menu(menu_items):
+    """编译一个菜单，返回 {权限级别: 只读菜单}"""
+    ordered = tuple(_compile_item(item) for item in sorted(menu_items, key=lambda item: item.get('order', 0)))
+    return {
+        level: tuple(item for item in ordered
+                     if PERMISSION_LEVELS.get(item.get('permission', 'public'), 0) <= rank)
+        for level, rank in PERMISSION_LEVELS.items()
+    }
+
+
+def _base_url(app):
+    """按应用配置构造解析URL使用的根地址"""
+    scheme = app.config.get('PREFERRED_URL_SCHEME') or 'http'
+    server_name = app.config.get('SERVER_NAME') or 'localhost'
+    root = (app.config.get('APPLICATION_ROOT') or '/').rstrip('/')
+    return f"{scheme}://{server_name}{root}/"
+
+
+def compile_menus(app):
+    """在应用启动、蓝图注册完成后调用，编译所有静态菜单"""
+    global _compiled_menus
+
+    with app.test_request_context('/', base_url=_base_url(app)):
+        _compiled_menus = {
+            'admin': _compile_menu(ADMIN_MENU_ITEMS),
+            'user': _compile_menu(USER_MENU),
+            'public': _compile_menu(PUBLIC_MENU)
+        }
+
+
+def _get_compiled(name):
+    if not _compiled_menus:
+        from flask import current_app
+        compile_menus(current_app._get_current_object())
+    return _compiled_menus[name]
+
+
+def get_permission_level(current_user=None):
+    """根据用户确定菜单权限级别"""
+    if current_user is None or not getattr(current_user, 'is_authenticated', False):
+        return 'public'
+    if getattr(current_user, 'is_admin', False):
+        return 'admin'
+    return 'user'
+
+
 # ==================== 菜单获取函数 ====================
 def get_admin_menu(current_user=None):
     """获取管理员菜单"""
-    return ADMIN_MENU_ITEMS
+    if current_user is None:
+        return _get_compiled('admin')['admin']
+    return _get_compiled('admin')[get_permission_level(current_user)]
 
 
 def get_user_menu(current_user=None):
     """获取普通用户菜单"""
-    return USER_MENU
+    if current_user is None:
+        return _get_compiled('user')['user']
+    return _get_compiled('user')[get_permission_level(current_user)]
 
 
 def get_public_menu():
     """获取公共菜单"""
-    return PUBLIC_MENU
\ No newline at end of file
+    return _get_compiled('public')['public']
@@ -33,4 +33,49 @@ class Config:
     # 应用配置
     USERS_PER_PAGE = 20
 
-    ANNOUNCEMENTS_PER_PAGE = 10
\ No newline at end of file
+    ANNOUNCEMENTS_PER_PAGE = 10
+
+    # 动态菜单缓存配置
+    MENU_VERSION_CHECK_INTERVAL = 5  # 检查共享版本号的间隔（秒），即其他进程变更的最长可见延迟
+    MENU_CHANGE_STREAM = os.environ.get('MENU_CHANGE_STREAM', 'false').lower() == 'true'  # 副本集可开启变更流
+
+    # 用户加载缓存配置（user_loader）
+    USER_CACHE_SIZE = 1024  # 最多缓存的用户数
+    USER_CACHE_TTL = 30  # 缓存有效期（秒），也是其他进程修改用户后的最长可见延迟
+
+    # 服务端会话配置
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or 'cookie'  # cookie（Flask默认） / mongo / memory（测试、单节点）；切换存储会使已登录用户需要重新登录
+    SESSION_MONGO_COLLECTION = 'sessions'
+    SESSION_WRITE_THRESHOLD = 60  # 会话数据未变化时，过期时间至少推后这么多秒才重新写入
+
+    # 密码哈希线程池配置
+    PASSWORD_HASH_WORKERS = 4  # 同时执行哈希的线程数
+    PASSWORD_HASH_QUEUE = 16  # 允许排队的任务数，超出时直接返回"系统繁忙"
+    PASSWORD_HASH_TIMEOUT = 10  # 单次等待结果的最长时间（秒）
+
+    # 密码哈希算法配置（可用 manage.py 的"校准密码哈希成本"确定成本）
+    PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER') or 'scrypt'  # pbkdf2 / scrypt / bcrypt
+    PASSWORD_HASH_COST = int(os.environ['PASSWORD_HASH_COST']) if os.environ.get('PASSWORD_HASH_COST') else None  # None 使用算法默认成本
+    PASSWORD_SCRYPT_MAXMEM = 64 * 1024 * 1024  # scrypt 单次计算的内存上限（字节），限制成本 n；总占用约为该值乘以 PASSWORD_HASH_WORKERS
+
+    # 公告查看次数缓冲配置
+    VIEW_COUNT_FLUSH_INTERVAL = 5  # 最长写入间隔（秒）
+    VIEW_COUNT_FLUSH_THRESHOLD = 100  # 累计查看次数达到该值时立即写入
+    VIEW_COUNT_WRITE_CONCERN = int(os.environ.get('VIEW_COUNT_WRITE_CONCERN', 1))  # 0 为不确认写入
+
+    # 列表总数缓存配置（公告等）
+    ANNOUNCEMENT_VERSION_CHECK_INTERVAL = 5  # 检查公告共享版本号的间隔（秒），即其他进程写入后总数缓存和页面校验值的最长延迟
+    COUNT_CACHE_TTL = 300  # 缓存的总数最长有效期（秒），覆盖未递增版本号的写入（如初始化脚本）
+    BUILD_ID = os.environ.get('BUILD_ID')  # 部署标识，参与页面 ETag；未设置时使用模板文件摘要
+
+    # 已发布公告读模型配置
+    ANNOUNCEMENT_CACHE_MAX_ITEMS = 1000  # 内存中最多保留的已发布公告数（不含正文），超出部分查询数据库
+    ANNOUNCEMENT_CACHE_CONTENT_BYTES = 4 * 1024 * 1024  # 正文缓存的总大小上限（字节）
+    ANNOUNCEMENT_CACHE_MAX_AGE = 300  # 快照最长有效期（秒），覆盖未递增版本号的写入
+
+    # 索引配置（索引定义见 utils/indexes.py）
+    SYNC_INDEXES_ON_STARTUP = os.environ.get('SYNC_INDEXES_ON_STARTUP', 'true').lower() == 'true'  # 启动时在后台创建缺少的索引
+
+    # 数据导出配置（管理后台导出用户、公告）
+    EXPORT_BATCH_SIZE = 1000  # 每次从数据库游标读取的文档数
+    EXPORT_CHUNK_ROWS = 500  # 每累计多少行向客户端输出一次
@@ -40,52 +40,21 @@ def create_collections_and_indexes():
         db.create_collection('dynamic_functions')
         print("✅ dynamic_functions 集合创建完成")
 
-    # 创建索引
-    print("📊 创建 dynamic_functions 集合索引...")
-    db.dynamic_functions.create_index([('name', 1)], unique=True, name='name_unique')
-    db.dynamic_functions.create_index([('menu_level', 1)], name='menu_level_idx')
-    db.dynamic_functions.create_index([('is_active', 1)], name='is_active_idx')
-    db.dynamic_functions.create_index([('show_in_menu', 1)], name='show_in_menu_idx')
-    db.dynamic_functions.create_index([('menu_order', 1)], name='menu_order_idx')
-    db.dynamic_functions.create_index([('created_at', -1)], name='created_at_idx')
-    print("✅ dynamic_functions 索引创建完成")
-
     # 2. 创建 announcements 集合（公告系统）
     if 'announcements' not in db.list_collection_names():
         print("🆕 创建 announcements 集合...")
         db.create_collection('announcements')
         print("✅ announcements 集合创建完成")
 
-    # 创建索引
-    print("📊 创建 announcements 集合索引...")
-    db.announcements.create_index([('status', 1)], name='status_idx')
-    db.announcements.create_index([('is_pinned', -1), ('priority', -1), ('publish_time', -1)],
-                                  name='display_order_idx')
-    db.announcements.create_index([('category', 1)], name='category_idx')
-    db.announcements.create_index([('author_id', 1)], name='author_idx')
-    db.announcements.create_index([('created_at', -1)], name='ann_created_at_idx')
-
-    # 创建文本搜索索引
-    try:
-        db.announcements.create_index([
-            ('title', 'text'),
-            ('content', 'text')
-        ], name='text_search_idx')
-        print("✅ 全文搜索索引创建完成")
-    except Exception as e:
-        print(f"⚠️  全文搜索索引创建失败（可能需要特殊配置）: {e}")
-
-    print("✅ announcements 索引创建完成")
-
     # 3. 可选：创建 function_access_logs 集合（功能访问日志）
     if 'function_access_logs' not in db.list_collection_names():
         print("🆕 创建 function_access_logs 集合...")
         db.create_collection('function_access_logs')
-        db.function_access_logs.create_index([('function_id', 1)], name='function_id_idx')
-        db.function_access_logs.create_index([('user_id', 1)], name='user_id_idx')
-        db.function_access_logs.create_index([('access_time', -1)], name='access_time_idx')
         print("✅ function_access_logs 集合创建完成")
 
+    # 4. 按索引注册表同步全部集合的索引（删除注册表之外的旧索引，如 text_search_idx）
+    sync_registered_indexes(db, drop_unknown=True)
+
     print("=" * 60)
     print("数据库升级完成！")
     print("=" * 60)
@@ -93,6 +62,34 @@ def create_collections_and_indexes():
     return db
 
 
+def sync_registered_indexes(db, drop_unknown=False):
+    """按 utils/indexes.py 中的注册表同步索引（可重复执行）"""
+    from utils.indexes import sync_indexes
+
+    print("📊 同步索引...")
+    icons = {'ok': '  ', 'created': '🆕', 'rebuilt': '🔁', 'renamed': '🔁', 'dropped': '🗑️ ', 'failed': '⚠️ ',
+             'drifted': '⚠️ ', 'conflict': '⚠️ '}
+    for collection, items in sync_indexes(db, drop_unknown=drop_unknown).items():
+        for name, action in items:
+            print(f"  {icons[action]} {collection}.{name}: {action}")
+    print("✅ 索引同步完成")
+
+
+def verify_query_shapes(db):
+    """对生产查询形状执行 explain，有全表扫描或内存排序时返回 False"""
+    from utils.indexes import verify_query_shapes as verify
+
+    print("\n🔍 检查查询形状...")
+    passed = True
+    for shape, problems in verify(db):
+        if problems:
+            passed = False
+            print(f"  ❌ {shape.collection}: {shape.description} -> {', '.join(problems)}")
+        else:
+            print(f"  ✅ {shape.collection}: {shape.description}")
+    return passed
+
+
 def add_default_dynamic_functions(db):
     """添加默认的动态功能配置"""
     print("\n🔄 添加默认动态功能配置...")
@@ -252,16 +249,84 @@ def add_sample_announcements(db):
         }
     ]
 
+    from models.announcement import build_derived_fields
+    for announcement in sample_announcements:
+        announcement.update(build_derived_fields(announcement))
+
     # 清除现有示例数据（可选）
     db.announcements.delete_many({'author_id': 'system'})
 
     # 插入新数据
     db.announcements.insert_many(sample_announcements)
+
+    # 递增公告版本号，运行中的应用在下一次检查时重建读模型和总数缓存
+    from types import SimpleNamespace
+    from utils.cache_versions import announcements_version
+    announcements_version.bump(SimpleNamespace(db=db))
     print(f"✅ 添加了 {len(sample_announcements)} 条示例公告")
 
 
+def backfill_announcement_fields(db):
+    """为旧公告补充写入时计算的字段（摘要、纯文本、格式化时间）"""
+    from pymongo import UpdateOne
+    from models.announcement import build_derived_fields
+
+    print("\n🔄 回填公告摘要字段...")
+
+    cursor = db.announcements.find(
+        {'summary': {'$exists': False}},
+        {'content': 1, 'publish_time': 1, 'created_at': 1}
+    ).batch_size(500)
+
+    operations = []
+    total = 0
+    for announcement in cursor:
+        operations.append(UpdateOne({'_id': announcement['_id']},
+                                    {'$set': build_derived_fields(announcement)}))
+        if len(operations) >= 500:
+            total += db.announcements.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        total += db.announcements.bulk_write(operations, ordered=False).modified_count
+
+    print(f"✅ 回填了 {total} 条公告")
+
+
+def backfill_user_search_fields(db):
+    """为旧用户补写搜索键（小写用户名、邮箱和三元组）"""
+    from utils import user_search
+
+    print("\n🔄 回填用户搜索键...")
+    total = user_search.backfill_search_fields(db)
+    print(f"✅ 回填了 {total} 个用户")
+
+
+def rebuild_search_index(db):
+    """全量重建公告搜索倒排索引"""
+    from utils import search_index
+
+    print("\n🔍 重建公告搜索索引...")
+    count = search_index.rebuild_index(db)
+    print(f"✅ 已索引 {count} 条公告")
+
+
+def reconcile_counters(db):
+    """从头重新计算管理后台使用的计数器（修正偏差）"""
+    from utils.counters import reconcile_counters as reconcile
+
+    print("\n🔢 校准统计计数器...")
+    for name, counts in reconcile(db).items():
+        print(f"  ✅ {name}: {counts}")
+
+
 def main():
-    """主函数"""
+    """主函数
+    python database_upgrade.py          完整升级
+    python database_upgrade.py indexes  只同步索引
+    python database_upgrade.py verify   检查生产查询是否都命中索引（失败时退出码为1）
+    python database_upgrade.py counters 重新计算统计计数器
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else None
     try:
         print("🚀 MyWeb 数据库升级工具")
         print("=" * 60)
@@ -271,6 +336,20 @@ def main():
         db.command('ping')
         print("✅ MongoDB 连接成功")
 
+        if command == 'indexes':
+            sync_registered_indexes(db, drop_unknown=True)
+            return
+        if command == 'verify':
+            if not verify_query_shapes(db):
+                sys.exit(1)
+            return
+        if command == 'counters':
+            reconcile_counters(db)
+            return
+        if command is not None:
+            print(f"❌ 未知的命令: {command}（可选: indexes, verify, counters）")
+            sys.exit(2)
+
         # 创建集合和索引
         db = create_collections_and_indexes()
 
@@ -280,6 +359,18 @@ def main():
         # 添加示例公告
         add_sample_announcements(db)
 
+        # 回填旧公告的派生字段
+        backfill_announcement_fields(db)
+
+        # 重建公告搜索索引
+        rebuild_search_index(db)
+
+        # 回填用户搜索键
+        backfill_user_search_fields(db)
+
+        # 计算统计计数器
+        reconcile_counters(db)
+
         print("\n" + "=" * 60)
         print("🎉 数据库升级完成！")
         print("=" * 60)
@@ -287,6 +378,7 @@ def main():
         print("1. 动态功能系统（dynamic_functions）")
         print("2. 公告管理系统（announcements）")
         print("3. 访问日志系统（function_access_logs）")
+        print("4. 用户登录索引（users.username / users.email）")
         print("\n现在可以启动应用测试新功能了！")
 
     except Exception as e:
@@ -10,6 +10,12 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import app
 from datetime import datetime
+from models.announcement import build_derived_fields
+from utils.cache_versions import announcements_version
+from utils.counters import reconcile_counters
+from utils.indexes import sync_indexes
+from utils import search_index
+from utils.search_index import TERMS_COLLECTION
 
 
 def init_announcements_collection():
@@ -17,21 +23,8 @@ def init_announcements_collection():
     with app.app_context():
         mongo = app.mongo
 
-        # 创建索引
-        mongo.db.announcements.create_index([('status', 1)])
-        mongo.db.announcements.create_index([('is_pinned', -1), ('priority', -1), ('publish_time', -1)])
-        mongo.db.announcements.create_index([('category', 1)])
-        mongo.db.announcements.create_index([('author_id', 1)])
-        mongo.db.announcements.create_index([('created_at', -1)])
-
-        # 创建全文搜索索引（可选）
-        try:
-            mongo.db.announcements.create_index([
-                ('title', 'text'),
-                ('content', 'text')
-            ])
-        except:
-            print("注意：全文搜索索引可能需要特殊的MongoDB配置")
+        # 按索引注册表创建索引（全文搜索使用 announcement_terms 倒排索引，见 utils/search_index.py）
+        sync_indexes(mongo.db, collections=['announcements', TERMS_COLLECTION])
 
         print("✅ announcements集合索引创建完成")
 
@@ -93,11 +86,22 @@ def add_sample_announcements():
         }
     ]
 
-    # 清除现有示例数据（可选）
-    mongo.db.announcements.delete_many({'author_id': 'admin'})
+    for announcement in sample_announcements:
+        announcement.update(build_derived_fields(announcement))
 
-    # 插入新数据
+    # 清除现有示例数据及其搜索倒排记录（可选）
+    old_ids = [doc['_id'] for doc in mongo.db.announcements.find({'author_id': 'admin'}, {'_id': 1})]
+    mongo.db.announcements.delete_many({'_id': {'$in': old_ids}})
+    search_index.remove_announcements(mongo.db, old_ids)
+
+    # 插入新数据，并与路由一样建立搜索倒排记录
     mongo.db.announcements.insert_many(sample_announcements)
+    for announcement in sample_announcements:
+        search_index.index_announcement(mongo.db, announcement)
+
+    # 直接批量写入，重新计算公告计数器，并递增版本号使运行中应用的读模型失效
+    reconcile_counters(mongo.db, ['announcements'])
+    announcements_version.bump(mongo)
 
 
 if __name__ == '__main__':
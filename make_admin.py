@@ -8,7 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import mongo
-from datetime import datetime
+from models.user import User
 
 print("=" * 60)
 print("MyWeb - 管理员权限设置工具")
@@ -66,19 +66,16 @@ try:
         confirm = input(f"\n⚠️  确定要将 [{username}] 设为管理员吗？(y/N): ").strip().lower()
 
         if confirm == 'y' or confirm == 'yes':
-            # 5. 更新用户为管理员
-            result = mongo.db.users.update_one(
-                {'email': user_email},
-                {'$set': {
-                    'is_admin': True,
-                    'user_is_admin': True,
-                    'email_verified': True,
-                    'is_active': True,
-                    'updated_at': datetime.utcnow()
-                }}
-            )
-
-            if result.modified_count > 0:
+            # 5. 更新用户为管理员（通过 User.update 同步统计计数器和用户缓存）
+            already_admin = all(user.get(field) is True for field in ('is_admin', 'email_verified', 'is_active'))
+            User.update(mongo, user['_id'], {
+                'is_admin': True,
+                'user_is_admin': True,
+                'email_verified': True,
+                'is_active': True
+            })
+
+            if not already_admin:
                 print(f"\n" + "=" * 50)
                 print(f"✅ 成功！用户 [{username}] 现在是管理员了")
                 print("=" * 50)
@@ -8,8 +8,10 @@ import os
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import mongo
+from app import app, mongo
 from models.user import User
+from utils.passwords import password_hasher, calibrate_cost, HASHERS
+from utils.counters import delete_users
 from bson import ObjectId
 from datetime import datetime, timedelta
 
@@ -25,20 +27,24 @@ def print_menu():
     print("5. 验证用户邮箱（测试用）")
     print("6. 创建测试用户")
     print("7. 显示统计信息")
-    print("8. 退出")
+    print("8. 校准密码哈希成本")
+    print("9. 退出")
     print("=" * 50)
 
 
 def list_all_users():
-    """列出所有用户"""
+    """列出所有用户（逐批读取，不把全部用户载入内存；导出请使用管理后台的导出功能）"""
     try:
-        users = list(mongo.db.users.find().sort('created_at', -1))
-
-        if not users:
+        total = mongo.db.users.count_documents({})
+        if total == 0:
             print("暂无用户")
-            return users
+            return 0
+
+        users = mongo.db.users.find(
+            {}, {'username': 1, 'email': 1, 'email_verified': 1, 'is_active': 1, 'created_at': 1}
+        ).sort('created_at', -1).batch_size(1000)
 
-        print(f"\n总用户数: {len(users)}")
+        print(f"\n总用户数: {total}")
         print("-" * 100)
         print(f"{'序号':<4} {'ID':<24} {'用户名':<15} {'邮箱':<25} {'验证':<6} {'激活':<6} {'创建时间':<20}")
         print("-" * 100)
@@ -65,10 +71,10 @@ def list_all_users():
 
             print(f"{i:<4} {user_id:<24} {username:<15} {email:<25} {verified:<6} {active:<6} {created_str:<20}")
 
-        return users
+        return total
     except Exception as e:
         print(f"❌ 列出用户时出错: {e}")
-        return []
+        return 0
 
 
 def search_user():
@@ -124,8 +130,7 @@ def delete_user():
             confirm = input(f"\n确定要删除用户 {user.get('username')} ({user.get('email')}) 吗？(y/N): ")
 
             if confirm.lower() == 'y':
-                result = mongo.db.users.delete_one({'_id': user['_id']})
-                if result.deleted_count > 0:
+                if delete_users(mongo.db, {'_id': user['_id']}) > 0:
                     print("✅ 用户删除成功")
                 else:
                     print("❌ 删除失败")
@@ -163,11 +168,11 @@ def cleanup_unverified_users():
 
         confirm = input(f"\n确定要删除这 {len(users_to_delete)} 个用户吗？(y/N): ")
         if confirm.lower() == 'y':
-            result = mongo.db.users.delete_many({
+            deleted_count = delete_users(mongo.db, {
                 'email_verified': False,
                 'created_at': {'$lt': cutoff_date}
             })
-            print(f"✅ 清理完成，删除了 {result.deleted_count} 个用户")
+            print(f"✅ 清理完成，删除了 {deleted_count} 个用户")
         else:
             print("取消清理")
 
@@ -191,20 +196,14 @@ def verify_user_email():
             confirm = input(f"\n确定要验证用户 {user.get('username')} 的邮箱吗？(y/N): ")
 
             if confirm.lower() == 'y':
-                result = mongo.db.users.update_one(
-                    {'_id': user['_id']},
-                    {'$set': {
-                        'email_verified': True,
-                        'is_active': True,
-                        'email_verification_token': '',
-                        'email_verification_sent_at': None,
-                        'updated_at': datetime.utcnow()
-                    }}
-                )
-                if result.modified_count > 0:
-                    print("✅ 邮箱验证成功")
-                else:
-                    print("❌ 验证失败")
+                # User.update 会同时更新用户计数器
+                User.update(mongo, user['_id'], {
+                    'email_verified': True,
+                    'is_active': True,
+                    'email_verification_token': '',
+                    'email_verification_sent_at': None
+                })
+                print("✅ 邮箱验证成功")
             else:
                 print("取消验证")
         else:
@@ -239,7 +238,7 @@ def create_test_user():
     user_data = {
         'username': username,
         'email': email,
-        'password': password,
+        'password_hash': password_hasher.hash_password(password),
         'is_active': True,
         'is_admin': is_admin,
         'email_verified': True,  # 测试用户默认已验证
@@ -289,6 +288,36 @@ def show_statistics():
             print(f"  {day.strftime('%m-%d')}: {count} 人")
 
 
+def calibrate_password_hasher():
+    """按目标校验耗时确定密码哈希成本"""
+    print(f"\n可选算法: {', '.join(HASHERS)}（当前配置: {app.config.get('PASSWORD_HASHER')}）")
+    scheme = input("算法 (默认当前配置): ").strip() or app.config.get('PASSWORD_HASHER', 'scrypt')
+    if scheme not in HASHERS:
+        print("❌ 未知的算法")
+        return
+
+    try:
+        target_ms = int(input("目标校验耗时（毫秒，默认250）: ").strip() or "250")
+    except ValueError:
+        print("请输入有效的数字")
+        return
+
+    print("\n正在测量...")
+    try:
+        cost, measurements = calibrate_cost(scheme, target_ms)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+
+    print("-" * 40)
+    print(f"{'成本':>12} {'校验耗时(ms)':>14}")
+    for measured_cost, elapsed in measurements:
+        print(f"{measured_cost:>12} {elapsed:>14.1f}")
+    print("-" * 40)
+    print(f"✅ 建议配置: PASSWORD_HASHER={scheme} PASSWORD_HASH_COST={cost}")
+    print("   旧密码会在用户下次成功登录时自动按新参数重新哈希")
+
+
 def main():
     """主函数"""
     # 测试数据库连接
@@ -303,7 +332,7 @@ def main():
         print_menu()
 
         try:
-            choice = input("\n请选择操作 (1-8): ").strip()
+            choice = input("\n请选择操作 (1-9): ").strip()
 
             if choice == '1':
                 list_all_users()
@@ -320,10 +349,12 @@ def main():
             elif choice == '7':
                 show_statistics()
             elif choice == '8':
+                calibrate_password_hasher()
+            elif choice == '9':
                 print("\n再见！")
                 break
             else:
-                print("❌ 无效的选择，请输入 1-8 之间的数字")
+                print("❌ 无效的选择，请输入 1-9 之间的数字")
 
             input("\n按回车键继续...")
 
@@ -0,0 +1,66 @@
+"""
+公告数据辅助
+摘要、纯文本和格式化时间在创建/编辑公告时计算并保存到文档中，
+列表页只需按 LIST_PROJECTION 读取，不再传输和处理完整的 content。
+"""
+
+import re
+from datetime import datetime
+
+SUMMARY_LENGTH = 100
+
+# 公告分类（与创建/编辑表单的选项一致）
+CATEGORIES = ('通知', '更新', '维护', '活动')
+
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# 列表查询不需要正文
+LIST_PROJECTION = {
+    'content': 0,
+    'plain_text': 0
+}
+
+
+def html_to_text(content):
+    """移除HTML标签，得到纯文本"""
+    return HTML_TAG_RE.sub('', content or '')
+
+
+def build_summary(plain_text):
+    if len(plain_text) > SUMMARY_LENGTH:
+        return plain_text[:SUMMARY_LENGTH] + '...'
+    return plain_text
+
+
+def build_content_fields(content):
+    """由正文派生的字段"""
+    plain_text = html_to_text(content)
+    return {
+        'plain_text': plain_text,
+        'summary': build_summary(plain_text)
+    }
+
+
+def build_time_fields(publish_time):
+    """由发布时间派生的显示字段"""
+    if isinstance(publish_time, str):
+        try:
+            publish_time = datetime.fromisoformat(publish_time.replace('Z', '+00:00'))
+        except ValueError:
+            return {}
+
+    if not isinstance(publish_time, datetime):
+        return {}
+
+    return {
+        'publish_time_str': publish_time.strftime('%Y-%m-%d %H:%M'),
+        'publish_date': publish_time.strftime('%Y-%m-%d'),
+        'publish_time_only': publish_time.strftime('%H:%M')
+    }
+
+
+def build_derived_fields(announcement):
+    """计算公告文档的全部派生字段（用于写入和数据回填）"""
+    fields = build_content_fields(announcement.get('content', ''))
+    fields.update(build_time_fields(announcement.get('publish_time') or announcement.get('created_at')))
+    return fields
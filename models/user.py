@@ -1,10 +1,147 @@
 from datetime import datetime
-from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.hashing import hashing_pool, HashingPoolSaturated
+from utils.passwords import password_hasher
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.collation import Collation, CollationStrength
+from utils import counters, user_search
+from collections import OrderedDict
+import threading
+import time
 
 
-class User(UserMixin):
+class UserCache:
+    """按用户ID缓存用户文档（LRU淘汰 + TTL过期），供 user_loader 使用
+
+    缓存的是数据库文档而不是 User 对象，每次命中都会构造新的 User，避免请求之间共享可变状态。
+    其他进程（manage.py、auto_cleanup.py）的修改最多在 TTL 之后生效。
+    """
+
+    def __init__(self, max_size=1024, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.get('USER_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, user_data):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user_data)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# 全局用户缓存实例
+user_cache = UserCache()
+
+
+# 会话加载和页面展示需要的字段（不含 password_hash）
+SESSION_PROJECTION = {
+    'username': 1,
+    'email': 1,
+    'avatar': 1,
+    'bio': 1,
+    'created_at': 1,
+    'updated_at': 1,
+    'is_active': 1,
+    'is_admin': 1,
+    'email_verified': 1
+}
+
+# 登录校验需要的字段（会话字段 + 密码哈希）
+LOGIN_PROJECTION = dict(SESSION_PROJECTION, password_hash=1)
+
+# 只判断是否存在时使用
+EXISTS_PROJECTION = {'_id': 1}
+
+# 用户名/邮箱不区分大小写的排序规则，查询必须与 users 集合上的唯一索引使用相同的 collation 才能命中索引
+USER_COLLATION = Collation(locale='en', strength=CollationStrength.SECONDARY)
+
+# 管理后台用户列表需要的字段
+LIST_PROJECTION = {
+    'username': 1,
+    'avatar': 1,
+    'email': 1,
+    'created_at': 1,
+    'updated_at': 1,
+    'is_active': 1,
+    'is_admin': 1,
+    'email_verified': 1
+}
+
+
+class UserCredentials:
+    """用户凭据，只在需要校验密码时加载"""
+    __slots__ = ('user_id', 'password_hash')
+
+    def __init__(self, user_id, password_hash):
+        self.user_id = user_id
+        self.password_hash = password_hash or ''
+
+    def check_password(self, password):
+        return hashing_pool.check_password(self.password_hash, password)
+
+    @staticmethod
+    def get_by_user_id(mongo, user_id):
+        user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'password_hash': 1})
+        if user_data:
+            return UserCredentials(str(user_data['_id']), user_data.get('password_hash'))
+        return None
+
+
+class User:
+    """用户模型（实现Flask-Login所需接口，使用 __slots__ 减少每次请求的内存分配）"""
+    __slots__ = ('id', 'username', 'email', 'avatar', 'bio', 'created_at', 'updated_at',
+                 '_is_active', '_is_admin', 'email_verified', '_credentials')
+
+    # Python 3 定义 __eq__ 后会把 __hash__ 置为 None，这里恢复默认实现
+    __hash__ = object.__hash__
+
     def __init__(self, user_data):
         if user_data is None:
             return None
@@ -12,7 +149,6 @@ class User(UserMixin):
         self.id = str(user_data['_id']) if '_id' in user_data else None
         self.username = user_data.get('username', '')
         self.email = user_data.get('email', '')
-        self.password_hash = user_data.get('password_hash', '')
         self.avatar = user_data.get('avatar', '')
         self.bio = user_data.get('bio', '')
         self.created_at = user_data.get('created_at', datetime.utcnow())
@@ -23,26 +159,80 @@ class User(UserMixin):
         self._is_admin = user_data.get('is_admin', False)
         self.email_verified = user_data.get('email_verified', False)
 
+        # 文档中带有密码哈希时（登录查询）直接构造凭据，否则在校验密码时再加载
+        if 'password_hash' in user_data:
+            self._credentials = UserCredentials(self.id, user_data['password_hash'])
+        else:
+            self._credentials = None
+
     # Flask-Login需要的属性（只读）
     @property
     def is_active(self):
         return self._is_active and self.email_verified
 
+    @property
+    def is_authenticated(self):
+        return self.is_active
+
+    @property
+    def is_anonymous(self):
+        return False
+
     @property
     def is_admin(self):
         return self._is_admin
 
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return NotImplemented
+        return not equal
+
+    @property
+    def credentials(self):
+        """按需加载用户凭据"""
+        if self._credentials is None and self.id:
+            from flask import current_app
+            self._credentials = UserCredentials.get_by_user_id(current_app.mongo, self.id)
+        return self._credentials
+
+    @property
+    def password_hash(self):
+        credentials = self.credentials
+        return credentials.password_hash if credentials else ''
+
+    @password_hash.setter
+    def password_hash(self, value):
+        self._credentials = UserCredentials(self.id, value)
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hashing_pool.generate_password_hash(password)
 
     def check_password(self, password):
-        # 添加调试信息
-        print(f"DEBUG: Checking password for user: {self.username}")
-        print(f"DEBUG: Stored password_hash: {self.password_hash}")
-        print(f"DEBUG: Input password: {password}")
-        result = check_password_hash(self.password_hash, password)
-        print(f"DEBUG: Password check result: {result}")
-        return result
+        """校验密码（在哈希线程池中执行，线程池已满时抛出 HashingPoolSaturated）"""
+        credentials = self.credentials
+        return credentials.check_password(password) if credentials else False
+
+    def rehash_password_if_needed(self, mongo, password):
+        """登录成功后调用：已存储的哈希算法或成本已过时则重新计算并保存"""
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        try:
+            new_password_hash = hashing_pool.generate_password_hash(password)
+        except HashingPoolSaturated:
+            # 繁忙时跳过，下次登录再升级
+            return False
+        User.update(mongo, self.id, {'password_hash': new_password_hash})
+        self.password_hash = new_password_hash
+        return True
 
     def to_dict(self):
         return {
@@ -60,29 +250,56 @@ class User(UserMixin):
 
     # 【关键修复】确保以下静态方法都存在：
     @staticmethod
-    def get_by_id(mongo, user_id):
+    def get_by_id(mongo, user_id, use_cache=True, projection=SESSION_PROJECTION):
+        # 缓存中保存的是 SESSION_PROJECTION 的字段，其他投影直接查询数据库
+        use_cache = use_cache and projection is SESSION_PROJECTION
         try:
-            user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)})
-            if user_data:
-                return User(user_data)
-            return None
-        except:
+            object_id = ObjectId(str(user_id))
+        except (InvalidId, TypeError):
             return None
 
+        user_id = str(object_id)
+        user_data = user_cache.get(user_id) if use_cache else None
+        if user_data is None:
+            user_data = mongo.db.users.find_one({'_id': object_id}, projection)
+            if user_data and use_cache:
+                user_cache.set(user_id, user_data)
+        if user_data:
+            return User(user_data)
+        return None
+
     @staticmethod
-    def get_by_email(mongo, email):
-        user_data = mongo.db.users.find_one({'email': email})
+    def get_by_email(mongo, email, projection=SESSION_PROJECTION):
+        user_data = mongo.db.users.find_one({'email': email}, projection, collation=USER_COLLATION)
         if user_data:
             return User(user_data)
         return None
 
     @staticmethod
-    def get_by_username(mongo, username):
-        user_data = mongo.db.users.find_one({'username': username})
+    def get_by_username(mongo, username, projection=SESSION_PROJECTION):
+        user_data = mongo.db.users.find_one({'username': username}, projection, collation=USER_COLLATION)
         if user_data:
             return User(user_data)
         return None
 
+    @staticmethod
+    def get_by_login(mongo, identifier, projection=LOGIN_PROJECTION):
+        """按用户名或邮箱查找用户（一次索引查询），两者分别命中不同用户时优先用户名"""
+        if not identifier:
+            return None
+
+        query = {'$or': [{'username': identifier}, {'email': identifier.lower()}]}
+        if projection is not None:
+            projection = dict(projection, username=1)
+        candidates = list(mongo.db.users.find(query, projection, collation=USER_COLLATION).limit(2))
+        if not candidates:
+            return None
+
+        for user_data in candidates:
+            if user_data.get('username', '').lower() == identifier.lower():
+                return User(user_data)
+        return User(candidates[0])
+
     @staticmethod
     def create(mongo, user_data):
         # 直接使用传入的 user_data
@@ -98,23 +315,44 @@ class User(UserMixin):
             'is_admin': user_data.get('is_admin', False),
             'email_verified': user_data.get('email_verified', False)
         }
+        user_dict.update(user_search.search_fields(user_dict['username'], user_dict['email']))
 
         result = mongo.db.users.insert_one(user_dict)
         user_dict['_id'] = result.inserted_id
+        counters.track_change(mongo.db, 'users', after=user_dict)
         return User(user_dict)
 
     @staticmethod
     def update(mongo, user_id, update_data):
         update_data['updated_at'] = datetime.utcnow()
-        mongo.db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$set': update_data}
-        )
+        if 'username' in update_data or 'email' in update_data:
+            # 用户名或邮箱变化时重新计算搜索键（需要另一个字段的当前值）
+            current = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'username': 1, 'email': 1}) or {}
+            update_data.update(user_search.search_fields(update_data.get('username', current.get('username')),
+                                                         update_data.get('email', current.get('email'))))
+        if not any(field in update_data for field in counters.USER_COUNTER_PROJECTION):
+            mongo.db.users.update_one(
+                {'_id': ObjectId(user_id)},
+                {'$set': update_data}
+            )
+        else:
+            # 修改了计入统计的字段：取得修改前的值，按差值更新计数器
+            before = mongo.db.users.find_one_and_update(
+                {'_id': ObjectId(user_id)},
+                {'$set': update_data},
+                projection=counters.USER_COUNTER_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+            if before is not None:
+                after = dict(before, **{field: update_data[field] for field in counters.USER_COUNTER_PROJECTION
+                                        if field in update_data})
+                counters.track_change(mongo.db, 'users', before, after)
+        user_cache.invalidate(user_id)
 
     @staticmethod
-    def get_all(mongo, page=1, per_page=20):
+    def get_all(mongo, page=1, per_page=20, projection=LIST_PROJECTION):
         skip = (page - 1) * per_page
-        users = mongo.db.users.find().skip(skip).limit(per_page)
+        users = mongo.db.users.find({}, projection).skip(skip).limit(per_page)
         return [User(user) for user in users]
 
     @staticmethod
@@ -6,6 +6,11 @@ from bson import ObjectId
 from datetime import datetime, timedelta
 from flask import current_app
 from config.admin_menu import get_admin_menu  # 只从config导入
+from models.user import LIST_PROJECTION
+from utils.pagination import CREATED_SORT
+from utils.counters import user_counts, announcement_summary
+from utils import user_search
+from utils.export import export_projection, export_response
 
 # 1. 首先定义蓝图
 admin_bp = Blueprint('admin', __name__)
@@ -36,33 +41,56 @@ def get_mongo():
 def dashboard():
     mongo = get_mongo()
 
-    # 获取统计数据
-    total_users = mongo.db.users.count_documents({})
-    active_users = mongo.db.users.count_documents({'email_verified': True})
-    unverified_users = mongo.db.users.count_documents({'email_verified': False})
-    admin_users = mongo.db.users.count_documents({'is_admin': True})
+    # 获取统计数据（读取计数器文档）
+    stats = user_counts(mongo.db)
 
     # 获取公告数量
-    announcements_count = mongo.db.announcements.count_documents({})
+    announcements_count = announcement_summary(mongo.db)['total']
 
     # 获取最后公告时间
-    last_announcement = mongo.db.announcements.find_one(sort=[('created_at', -1)])
+    last_announcement = mongo.db.announcements.find_one({}, {'created_at': 1}, sort=list(CREATED_SORT))
     last_announcement_time = last_announcement['created_at'].strftime('%Y-%m-%d %H:%M') if last_announcement else '暂无公告'
 
     # 获取管理员菜单（直接使用，不进行过滤）
     admin_menu = get_admin_menu(current_user)
 
     return render_template('admin/dashboard.html',
-                           total_users=total_users,
-                           active_users=active_users,
-                           unverified_users=unverified_users,
-                           admin_users=admin_users,
+                           total_users=stats['total'],
+                           active_users=stats['verified'],
+                           unverified_users=stats['unverified'],
+                           admin_users=stats['admins'],
                            announcements_count=announcements_count,
                            last_announcement_time=last_announcement_time,
                            current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                            admin_menu=admin_menu)  # 传递菜单数据
 
 
+# 用户列表筛选条件对应的统计项
+FILTER_STATS = {
+    'verified': 'verified',
+    'unverified': 'unverified',
+    'admins': 'admins',
+    'active': 'active',
+    'inactive': 'inactive'
+}
+
+
+def build_user_filter(filter_type):
+    """用户列表筛选条件（用户管理页和导出共用）"""
+    query = {}
+    if filter_type == 'verified':
+        query['email_verified'] = True
+    elif filter_type == 'unverified':
+        query['email_verified'] = False
+    elif filter_type == 'admins':
+        query['is_admin'] = True
+    elif filter_type == 'active':
+        query['is_active'] = True
+    elif filter_type == 'inactive':
+        query['is_active'] = False
+    return query
+
+
 @admin_bp.route('/users')
 @login_required
 @admin_required
@@ -79,34 +107,23 @@ def user_management():
     search = request.args.get('search', '').strip()
     filter_type = request.args.get('filter', 'all')
 
-    # 构建查询条件
-    query = {}
-
-    # 搜索条件
-    if search:
-        query['$or'] = [
-            {'username': {'$regex': search, '$options': 'i'}},
-            {'email': {'$regex': search, '$options': 'i'}}
-        ]
-
     # 筛选条件
-    if filter_type == 'verified':
-        query['email_verified'] = True
-    elif filter_type == 'unverified':
-        query['email_verified'] = False
-    elif filter_type == 'admins':
-        query['is_admin'] = True
-    elif filter_type == 'active':
-        query['is_active'] = True
-    elif filter_type == 'inactive':
-        query['is_active'] = False
+    query = build_user_filter(filter_type)
 
-    # 计算总数
-    total_users = mongo.db.users.count_documents(query)
+    # 统计信息（读取计数器文档）
+    stats = user_counts(mongo.db)
 
     # 分页查询
     skip = (page - 1) * per_page
-    users_cursor = mongo.db.users.find(query).sort('created_at', -1).skip(skip).limit(per_page)
+    if search:
+        # 按搜索键查找（最多 user_search.MAX_RESULTS 条，按相关度排序）
+        user_ids = user_search.search_user_ids(mongo.db, search, query)
+        total_users = len(user_ids)
+        users_cursor = user_search.fetch_users(mongo.db, user_ids[skip:skip + per_page], LIST_PROJECTION)
+    else:
+        # 没有搜索条件时总数直接取统计结果
+        total_users = stats[FILTER_STATS.get(filter_type, 'total')]
+        users_cursor = mongo.db.users.find(query, LIST_PROJECTION).sort('created_at', -1).skip(skip).limit(per_page)
 
     # 处理用户数据
     users = []
@@ -127,27 +144,48 @@ def user_management():
 
         users.append(user)
 
-    # 统计信息
-    stats = {
-        'total': mongo.db.users.count_documents({}),
-        'verified': mongo.db.users.count_documents({'email_verified': True}),
-        'unverified': mongo.db.users.count_documents({'email_verified': False}),
-        'admins': mongo.db.users.count_documents({'is_admin': True}),
-        'active': mongo.db.users.count_documents({'is_active': True}),
-        'inactive': mongo.db.users.count_documents({'is_active': False})
-    }
-
     return render_template('users.html',
                            users=users,
                            page=page,
                            per_page=per_page,
                            total_users=total_users,
                            search=search,
+                           search_limit=user_search.MAX_RESULTS,
                            filter_type=filter_type,
                            stats=stats,
                            admin_menu=admin_menu)  # 传递菜单数据
 
 
+# 用户导出字段：(表头, 字段名)，不包含密码哈希等敏感字段
+USER_EXPORT_FIELDS = [
+    ('ID', '_id'),
+    ('用户名', 'username'),
+    ('邮箱', 'email'),
+    ('邮箱已验证', 'email_verified'),
+    ('激活', 'is_active'),
+    ('管理员', 'is_admin'),
+    ('创建时间', 'created_at'),
+    ('更新时间', 'updated_at'),
+]
+
+
+@admin_bp.route('/users/export')
+@login_required
+@admin_required
+def export_users():
+    """按用户管理页的搜索和筛选条件流式导出用户（format=csv 或 ndjson）"""
+    mongo = get_mongo()
+    search = request.args.get('search', '').strip()
+    query = build_user_filter(request.args.get('filter', 'all'))
+
+    if search:
+        # 导出全部匹配的用户（不受页面搜索 MAX_RESULTS 条的限制），按创建时间排序
+        query = {'$and': [user_search.build_query(search), query]} if query else user_search.build_query(search)
+
+    cursor = mongo.db.users.find(query, export_projection(USER_EXPORT_FIELDS)).sort('created_at', -1)
+    return export_response(cursor, USER_EXPORT_FIELDS, 'users', request.args.get('format', 'csv'))
+
+
 # ... 其他路由函数保持不变，但都需要添加 admin_menu=admin_menu
 # 下面是其他路由函数的简化版本（需要添加admin_menu）
 
@@ -170,7 +208,7 @@ def cleanup_unverified_users_page():
     }
 
     # 获取要清理的用户列表
-    users_to_cleanup = list(mongo.db.users.find(query))
+    users_to_cleanup = list(mongo.db.users.find(query, {'username': 1, 'email': 1, 'created_at': 1}))
 
     # 转换数据格式
     for user in users_to_cleanup:
@@ -189,4 +227,28 @@ def cleanup_unverified_users_page():
 def admin_settings():
     """管理员设置"""
     admin_menu = get_admin_menu(current_user)  # 添加这行
-    return render_template('admin/settings.html', admin_menu=admin_menu)
\ No newline at end of file
+    return render_template('admin/settings.html', admin_menu=admin_menu)
+
+
+@admin_bp.route('/cache-stats')
+@login_required
+@admin_required
+def cache_stats():
+    """进程内缓存统计（用于调整缓存大小）"""
+    from models.user import user_cache
+    from utils.view_counter import view_counter
+    from utils.announcement_cache import announcement_cache
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'view_counter': view_counter.stats(),
+        'announcement_cache': announcement_cache.stats()
+    })
+
+
+@admin_bp.route('/hashing-stats')
+@login_required
+@admin_required
+def hashing_stats():
+    """密码哈希线程池统计（各操作耗时、被拒绝次数）"""
+    from utils.hashing import hashing_pool
+    return jsonify({'password_hashing': hashing_pool.stats()})
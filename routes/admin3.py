@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, jsonify, flash, current_a
 from flask_login import login_required, current_user
 from bson import ObjectId
 from datetime import datetime, timedelta
+from utils.counters import delete_users
+from utils import user_search
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -16,6 +18,11 @@ def get_user_model():
     return User
 
 
+def get_user_cache():
+    from models.user import user_cache
+    return user_cache
+
+
 def convert_mongo_doc(doc):
     """将MongoDB文档转换为可JSON序列化的字典"""
     if not doc:
@@ -134,10 +141,11 @@ def delete_user():
             return jsonify({'success': False, 'message': '不能删除自己的账户'}), 400
         query['email'] = email
 
-    # 执行删除
-    result = mongo.db.users.delete_one(query)
-
-    if result.deleted_count > 0:
+    # 执行删除（同时更新用户计数器），只使被删除用户的缓存失效
+    user_ids = [user['_id'] for user in mongo.db.users.find(query, {'_id': 1})]
+    if delete_users(mongo.db, query) > 0:
+        for deleted_id in user_ids:
+            get_user_cache().invalidate(deleted_id)
         # 记录删除日志
         print(f"管理员 {current_user.email} 删除了用户: {query}")
         return jsonify({'success': True, 'message': '用户删除成功'})
@@ -163,15 +171,16 @@ def cleanup_unverified_users():
     cutoff_date = datetime.utcnow() - timedelta(days=days)
 
     mongo = get_mongo()
-    result = mongo.db.users.delete_many({
+    deleted_count = delete_users(mongo.db, {
         'email_verified': False,
         'created_at': {'$lt': cutoff_date}
     })
+    get_user_cache().clear()
 
     return jsonify({
         'success': True,
-        'message': f'清理了 {result.deleted_count} 个超过{days}天未验证的用户',
-        'deleted_count': result.deleted_count
+        'message': f'清理了 {deleted_count} 个超过{days}天未验证的用户',
+        'deleted_count': deleted_count
     })
 
 
@@ -185,25 +194,24 @@ def search_users():
     per_page = 20
 
     mongo = get_mongo()
-    search_query = {}
-
-    if query_text:
-        # 支持按邮箱、用户名或ID搜索
-        if '@' in query_text:
-            search_query['email'] = {'$regex': query_text, '$options': 'i'}
-        elif ObjectId.is_valid(query_text):
-            try:
-                search_query['_id'] = ObjectId(query_text)
-            except:
-                pass
-        else:
-            search_query['username'] = {'$regex': query_text, '$options': 'i'}
-
-    total = mongo.db.users.count_documents(search_query)
     skip = (page - 1) * per_page
 
+    # 支持按ID、用户名或邮箱（前缀或子串）搜索
+    if ObjectId.is_valid(query_text):
+        user_ids = [user['_id'] for user in mongo.db.users.find({'_id': ObjectId(query_text)}, {'_id': 1})]
+    elif query_text:
+        user_ids = user_search.search_user_ids(mongo.db, query_text)
+    else:
+        user_ids = None
+
+    if user_ids is None:
+        total = mongo.db.users.count_documents({})
+        users_cursor = mongo.db.users.find().skip(skip).limit(per_page)
+    else:
+        users_cursor = user_search.fetch_users(mongo.db, user_ids[skip:skip + per_page])
+        total = len(user_ids)
+
     # 获取用户数据并转换
-    users_cursor = mongo.db.users.find(search_query).skip(skip).limit(per_page)
     users = []
 
     for user in users_cursor:
@@ -237,9 +245,10 @@ def test_delete_manual(user_email):
         return "❌ 不能删除自己的账户"
 
     # 执行删除
-    result = mongo.db.users.delete_one({'email': user_email})
+    deleted_count = delete_users(mongo.db, {'email': user_email})
+    get_user_cache().invalidate(user['_id'])
 
-    if result.deleted_count > 0:
+    if deleted_count > 0:
         return f"✅ 用户 {user_email} 删除成功"
     else:
         return f"❌ 用户 {user_email} 删除失败"
\ No newline at end of file
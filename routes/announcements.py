@@ -2,9 +2,20 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from datetime import datetime
 from bson import ObjectId
+from pymongo import UpdateOne, DeleteOne, ReturnDocument
+from pymongo.errors import BulkWriteError
 from config import get_admin_menu
 from functools import wraps
-from utils.menu_helper import get_admin_menu, filter_menu_by_permission
+from utils.menu_helper import get_admin_menu
+from models.announcement import (LIST_PROJECTION, CATEGORIES, build_derived_fields, build_content_fields,
+                                 build_time_fields)
+from utils.view_counter import view_counter
+from utils.pagination import ANNOUNCEMENT_SORT, CREATED_SORT, keyset_paginate, announcement_counts
+from utils import search_index, counters
+from utils.cache_versions import announcements_version
+from utils.http_cache import conditional_page
+from utils.announcement_cache import announcement_cache
+from utils.export import export_projection, export_response
 
 announcements_bp = Blueprint('announcements', __name__)
 
@@ -28,38 +39,21 @@ def admin_required(f):
     return decorated_function
 
 
+def announcements_changed(mongo):
+    """公告写入后调用，使各进程缓存的公告总数、已发布公告读模型和页面校验值失效"""
+    announcement_cache.invalidate()
+    announcements_version.bump(mongo)
+
+
 def convert_announcement_data(announcement):
-    """转换公告数据格式"""
+    """转换公告数据格式（摘要和格式化时间在写入时已计算，旧数据缺少时再补算）"""
     announcement['_id'] = str(announcement['_id'])
 
-    # 格式化发布时间 - 转换为本地时间
-    if 'publish_time' in announcement and announcement['publish_time']:
-        if isinstance(announcement['publish_time'], str):
-            # 如果是字符串，先转换为datetime对象
-            try:
-                dt = datetime.fromisoformat(announcement['publish_time'].replace('Z', '+00:00'))
-                announcement['publish_time'] = dt
-            except:
-                pass
-
-        # 格式化显示时间
-        announcement['publish_time_str'] = announcement['publish_time'].strftime('%Y-%m-%d %H:%M')
-        announcement['publish_date'] = announcement['publish_time'].strftime('%Y-%m-%d')
-        announcement['publish_time_only'] = announcement['publish_time'].strftime('%H:%M')
-    elif 'created_at' in announcement and announcement['created_at']:
-        # 如果没有发布时间，使用创建时间
-        announcement['publish_time_str'] = announcement['created_at'].strftime('%Y-%m-%d %H:%M')
-
-    # 生成内容摘要
-    if 'content' in announcement:
-        content = announcement['content']
-        # 移除HTML标签（如果有）并生成纯文本摘要
-        import re
-        plain_text = re.sub(r'<[^>]+>', '', content)  # 简单移除HTML标签
-        if len(plain_text) > 100:
-            announcement['summary'] = plain_text[:100] + '...'
-        else:
-            announcement['summary'] = plain_text
+    if 'publish_time_str' not in announcement:
+        announcement.update(build_time_fields(announcement.get('publish_time') or announcement.get('created_at')))
+
+    if 'summary' not in announcement and 'content' in announcement:
+        announcement.update(build_content_fields(announcement['content']))
 
     # 确保所有必要字段都存在
     announcement.setdefault('view_count', 0)
@@ -74,42 +68,83 @@ def convert_announcement_data(announcement):
 
 @announcements_bp.route('/announcements')
 @login_required
+@conditional_page()
 def announcement_list():
     """公告列表页面 - 所有登录用户都可以访问"""
     mongo = get_mongo()
 
-    # 分页参数
-    page = request.args.get('page', 1, type=int)
+    # 分页参数（游标分页，cursor 为空时显示第一页）
+    cursor = request.args.get('cursor')
     per_page = 15  # 每页显示数量
-    skip = (page - 1) * per_page
 
     # 构建查询条件：只显示已发布的公告
     query = {'status': 'published'}
 
-    # 获取公告总数
-    total = mongo.db.announcements.count_documents(query)
+    # 获取公告总数（优先使用读模型，其次是缓存的总数）
+    total = announcement_cache.count(mongo)
+    if total is None:
+        total = announcement_counts.count(mongo, 'announcements', query)
 
-    # 获取公告列表，按置顶和时间排序
-    announcements = list(mongo.db.announcements.find(query)
-                         .sort([('is_pinned', -1), ('publish_time', -1)])
-                         .skip(skip)
-                         .limit(per_page))
+    # 获取公告列表，按置顶和时间排序；超出读模型范围时查询数据库
+    result = announcement_cache.page(mongo, per_page, cursor=cursor)
+    if result is None:
+        result = keyset_paginate(mongo.db.announcements, query, ANNOUNCEMENT_SORT, per_page,
+                                 cursor=cursor, projection=LIST_PROJECTION)
 
     # 转换数据格式
-    announcements = [convert_announcement_data(ann) for ann in announcements]
+    announcements = [convert_announcement_data(ann) for ann in result.items]
 
     # 计算总页数
     total_pages = (total + per_page - 1) // per_page
 
     return render_template('announcements/list.html',
                            announcements=announcements,
-                           page=page,
+                           page=result.page,
+                           next_cursor=result.next_cursor,
+                           prev_cursor=result.prev_cursor,
                            total_pages=total_pages,
                            total=total)
 
 
+@announcements_bp.route('/announcements/search')
+@login_required
+def announcement_search():
+    """公告搜索（中文N-gram倒排索引）"""
+    mongo = get_mongo()
+    keyword = request.args.get('q', '').strip()
+
+    results = []
+    if keyword:
+        ranked = search_index.search(mongo.db, keyword)
+        ids = [announcement_id for announcement_id, _ in ranked]
+        docs = {doc['_id']: doc for doc in mongo.db.announcements.find(
+            {'_id': {'$in': ids}, 'status': 'published'},
+            {'content': 0}
+        )}
+
+        for announcement_id, score in ranked:
+            announcement = docs.get(announcement_id)
+            if announcement is None:
+                continue
+            announcement['title_html'] = search_index.highlight(announcement.get('title', ''), keyword)
+            announcement['snippet_html'] = search_index.snippet(announcement.get('plain_text', ''), keyword)
+            announcement['score'] = score
+            results.append(convert_announcement_data(announcement))
+
+    return render_template('announcements/search.html',
+                           keyword=keyword,
+                           results=results)
+
+
+def count_cached_view(announcement_id):
+    """浏览器缓存命中（304）时也记录一次查看"""
+    if ObjectId.is_valid(announcement_id):
+        view_counter.increment(ObjectId(announcement_id))
+
+
 @announcements_bp.route('/announcements/<announcement_id>')
 @login_required
+@conditional_page(on_not_modified=count_cached_view)
 def announcement_detail(announcement_id):
     """公告详情页面"""
     mongo = get_mongo()
@@ -120,21 +155,16 @@ def announcement_detail(announcement_id):
             flash('无效的公告ID', 'warning')
             return redirect(url_for('announcements.announcement_list'))
 
-        # 查找公告（必须是已发布的）
-        announcement = mongo.db.announcements.find_one({
-            '_id': ObjectId(announcement_id),
-            'status': 'published'
-        })
+        # 查找公告（必须是已发布的，优先从读模型读取）
+        announcement = announcement_cache.get(mongo, ObjectId(announcement_id))
 
         if not announcement:
             flash('公告不存在或已被删除', 'warning')
             return redirect(url_for('announcements.announcement_list'))
 
-        # 增加查看次数
-        mongo.db.announcements.update_one(
-            {'_id': ObjectId(announcement_id)},
-            {'$inc': {'view_count': 1}}
-        )
+        # 增加查看次数（先记入缓冲区，批量写库）
+        pending_views = view_counter.increment(announcement['_id'])
+        announcement['view_count'] = announcement.get('view_count', 0) + pending_views
 
         # 转换数据格式
         announcement = convert_announcement_data(announcement)
@@ -160,15 +190,25 @@ def admin_dashboard():
         flash('需要管理员权限', 'error')
         return redirect(url_for('announcements.announcement_list'))
 
-    # 获取管理员菜单
+    # 获取管理员菜单（启动时已按权限编译）
     admin_menu = get_admin_menu()
-    admin_menu = filter_menu_by_permission(admin_menu)
 
-    mongo = current_app.mongo
-    announcements = list(mongo.db.announcements.find().sort('created_at', -1))
+    mongo = get_mongo()
+
+    # 按状态、分类汇总（读取计数器文档）
+    stats = counters.announcement_summary(mongo.db)
+
+    # 最近公告（按创建时间倒序的游标分页，不读取正文）
+    result = keyset_paginate(mongo.db.announcements, {}, CREATED_SORT, 10,
+                             cursor=request.args.get('cursor'), projection=LIST_PROJECTION)
+    recent_announcements = [convert_announcement_data(ann) for ann in result.items]
 
     return render_template('announcements/admin_dashboard.html',
-                           announcements=announcements,
+                           stats=stats,
+                           recent_announcements=recent_announcements,
+                           page=result.page,
+                           next_cursor=result.next_cursor,
+                           prev_cursor=result.prev_cursor,
                            admin_menu=admin_menu)  # 传递菜单数据
 
 
@@ -185,22 +225,19 @@ def admin_announcement_list():
     if status != 'all':
         query['status'] = status
 
-    # 分页参数
-    page = request.args.get('page', 1, type=int)
+    # 分页参数（游标分页）
+    cursor = request.args.get('cursor')
     per_page = 20
-    skip = (page - 1) * per_page
 
-    # 获取公告总数
-    total = mongo.db.announcements.count_documents(query)
+    # 获取公告总数（缓存，公告变更时失效）
+    total = announcement_counts.count(mongo, 'announcements', query)
 
     # 获取公告列表
-    announcements = list(mongo.db.announcements.find(query)
-                         .sort([('is_pinned', -1), ('publish_time', -1)])
-                         .skip(skip)
-                         .limit(per_page))
+    result = keyset_paginate(mongo.db.announcements, query, ANNOUNCEMENT_SORT, per_page,
+                             cursor=cursor, projection=LIST_PROJECTION)
 
     # 转换数据格式
-    announcements = [convert_announcement_data(ann) for ann in announcements]
+    announcements = [convert_announcement_data(ann) for ann in result.items]
 
     # 计算总页数
     total_pages = (total + per_page - 1) // per_page
@@ -208,9 +245,12 @@ def admin_announcement_list():
     return render_template('announcements/admin_list.html',
                            announcements=announcements,
                            status=status,
-                           page=page,
+                           page=result.page,
+                           next_cursor=result.next_cursor,
+                           prev_cursor=result.prev_cursor,
                            total_pages=total_pages,
                            total=total,
+                           categories=CATEGORIES,
                            admin_menu=get_admin_menu())
 
 
@@ -265,9 +305,13 @@ def create_announcement():
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+        announcement.update(build_derived_fields(announcement))
 
         # 保存到数据库
         mongo.db.announcements.insert_one(announcement)
+        counters.track_change(mongo.db, 'announcements', after=announcement)
+        search_index.index_announcement(mongo.db, announcement)
+        announcements_changed(mongo)
 
         flash(f'公告{"发布" if status == "published" else "保存为草稿"}成功！', 'success')
         return redirect(url_for('announcements.admin_announcement_list'))
@@ -339,10 +383,22 @@ def edit_announcement(announcement_id):
             if status == 'published' and announcement.get('status') == 'draft':
                 update_data['publish_time'] = datetime.utcnow()
 
-            mongo.db.announcements.update_one(
+            # 重新计算摘要、纯文本和格式化时间
+            update_data.update(build_content_fields(content))
+            update_data.update(build_time_fields(
+                update_data.get('publish_time') or announcement.get('publish_time') or announcement.get('created_at')))
+
+            before = mongo.db.announcements.find_one_and_update(
                 {'_id': ObjectId(announcement_id)},
-                {'$set': update_data}
+                {'$set': update_data},
+                projection=counters.ANNOUNCEMENT_COUNTER_PROJECTION,
+                return_document=ReturnDocument.BEFORE
             )
+            if before is not None:
+                counters.track_change(mongo.db, 'announcements', before,
+                                      dict(before, status=status, category=category))
+            search_index.index_announcement(mongo.db, dict(update_data, _id=announcement['_id']))
+            announcements_changed(mongo)
 
             flash('公告更新成功！', 'success')
             return redirect(url_for('announcements.admin_announcement_list'))
@@ -370,9 +426,15 @@ def delete_announcement(announcement_id):
         if not ObjectId.is_valid(announcement_id):
             return jsonify({'success': False, 'message': '无效的公告ID'})
 
-        result = mongo.db.announcements.delete_one({'_id': ObjectId(announcement_id)})
+        deleted = mongo.db.announcements.find_one_and_delete(
+            {'_id': ObjectId(announcement_id)},
+            projection=counters.ANNOUNCEMENT_COUNTER_PROJECTION
+        )
 
-        if result.deleted_count > 0:
+        if deleted is not None:
+            counters.track_change(mongo.db, 'announcements', before=deleted)
+            search_index.remove_announcement(mongo.db, ObjectId(announcement_id))
+            announcements_changed(mongo)
             return jsonify({'success': True, 'message': '公告删除成功'})
         else:
             return jsonify({'success': False, 'message': '公告不存在'})
@@ -409,11 +471,18 @@ def toggle_announcement_status(announcement_id):
         # 如果是草稿转为发布，设置发布时间
         if new_status == 'published' and not announcement.get('publish_time'):
             update_data['publish_time'] = datetime.utcnow()
+            update_data.update(build_time_fields(update_data['publish_time']))
 
-        mongo.db.announcements.update_one(
+        before = mongo.db.announcements.find_one_and_update(
             {'_id': ObjectId(announcement_id)},
-            {'$set': update_data}
+            {'$set': update_data},
+            projection=counters.ANNOUNCEMENT_COUNTER_PROJECTION,
+            return_document=ReturnDocument.BEFORE
         )
+        if before is not None:
+            counters.track_change(mongo.db, 'announcements', before, dict(before, status=new_status))
+        search_index.update_status(mongo.db, announcement['_id'], new_status)
+        announcements_changed(mongo)
 
         status_text = '已发布' if new_status == 'published' else '草稿'
         return jsonify({
@@ -453,6 +522,7 @@ def toggle_pin_announcement(announcement_id):
                 'updated_at': datetime.utcnow()
             }}
         )
+        announcements_changed(mongo)
 
         pin_text = '已置顶' if new_pinned else '已取消置顶'
         return jsonify({
@@ -462,4 +532,173 @@ def toggle_pin_announcement(announcement_id):
         })
 
     except Exception as e:
-        return jsonify({'success': False, 'message': f'切换置顶状态时发生错误: {str(e)}'})
\ No newline at end of file
+        return jsonify({'success': False, 'message': f'切换置顶状态时发生错误: {str(e)}'})
+
+
+# 公告导出字段：(表头, 字段名)，正文只导出纯文本摘要
+ANNOUNCEMENT_EXPORT_FIELDS = [
+    ('ID', '_id'),
+    ('标题', 'title'),
+    ('分类', 'category'),
+    ('状态', 'status'),
+    ('置顶', 'is_pinned'),
+    ('优先级', 'priority'),
+    ('作者', 'author_name'),
+    ('查看次数', 'view_count'),
+    ('摘要', 'summary'),
+    ('发布时间', 'publish_time'),
+    ('创建时间', 'created_at'),
+    ('更新时间', 'updated_at'),
+]
+
+
+@announcements_bp.route('/admin/announcements/export')
+@login_required
+@admin_required
+def export_announcements():
+    """按状态流式导出公告（format=csv 或 ndjson）"""
+    mongo = get_mongo()
+
+    status = request.args.get('status', 'all')
+    query = {}
+    if status != 'all':
+        query['status'] = status
+
+    cursor = mongo.db.announcements.find(query, export_projection(ANNOUNCEMENT_EXPORT_FIELDS)) \
+        .sort(list(CREATED_SORT))
+    return export_response(cursor, ANNOUNCEMENT_EXPORT_FIELDS, 'announcements', request.args.get('format', 'csv'))
+
+
+# 批量操作：动作 -> 说明
+BULK_ACTIONS = {
+    'publish': '发布',
+    'unpublish': '撤回为草稿',
+    'pin': '置顶',
+    'unpin': '取消置顶',
+    'delete': '删除',
+    'recategorise': '修改分类'
+}
+BULK_MAX_IDS = 500
+
+
+def _bulk_operation(action, announcement, category, now):
+    """生成单条公告的写操作"""
+    query = {'_id': announcement['_id']}
+
+    if action == 'delete':
+        return DeleteOne(query)
+
+    update_data = {'updated_at': now}
+    if action == 'publish':
+        update_data['status'] = 'published'
+        if not announcement.get('publish_time'):
+            update_data['publish_time'] = now
+            update_data.update(build_time_fields(now))
+    elif action == 'unpublish':
+        update_data['status'] = 'draft'
+    elif action in ('pin', 'unpin'):
+        update_data['is_pinned'] = action == 'pin'
+    elif action == 'recategorise':
+        update_data['category'] = category
+
+    return UpdateOne(query, {'$set': update_data})
+
+
+def _bulk_result(action, announcement, category):
+    """操作后公告计入计数器的字段（删除时为 None）"""
+    if action == 'delete':
+        return None
+    if action in ('publish', 'unpublish'):
+        return dict(announcement, status='published' if action == 'publish' else 'draft')
+    if action == 'recategorise':
+        return dict(announcement, category=category)
+    return announcement
+
+
+@announcements_bp.route('/admin/announcements/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_announcements():
+    """批量操作公告：一次请求、一次 bulk_write，返回每条公告的结果"""
+    mongo = get_mongo()
+    data = request.get_json(silent=True) or {}
+
+    action = data.get('action')
+    category = data.get('category')
+    raw_ids = data.get('ids') or []
+
+    if action not in BULK_ACTIONS:
+        return jsonify({'success': False, 'message': '不支持的批量操作'}), 400
+    if action == 'recategorise' and category not in CATEGORIES:
+        return jsonify({'success': False, 'message': '无效的分类'}), 400
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return jsonify({'success': False, 'message': '请选择要操作的公告'}), 400
+    if len(raw_ids) > BULK_MAX_IDS:
+        return jsonify({'success': False, 'message': f'一次最多操作 {BULK_MAX_IDS} 条公告'}), 400
+
+    # 有效ID统一为 str(ObjectId)（小写），再去重并保持提交顺序
+    requested = list(dict.fromkeys(
+        str(ObjectId(str(raw_id))) if ObjectId.is_valid(str(raw_id)) else str(raw_id)
+        for raw_id in raw_ids
+    ))
+    results = {}
+    ids = []
+    for raw_id in requested:
+        if ObjectId.is_valid(raw_id):
+            ids.append(ObjectId(raw_id))
+        else:
+            results[raw_id] = {'success': False, 'message': '无效的公告ID'}
+
+    try:
+        # 一次查询取得所有公告的当前状态
+        announcements = {doc['_id']: doc for doc in mongo.db.announcements.find(
+            {'_id': {'$in': ids}}, {'status': 1, 'category': 1, 'publish_time': 1})}
+
+        targets = []
+        operations = []
+        now = datetime.utcnow()
+        for announcement_id in ids:
+            announcement = announcements.get(announcement_id)
+            if announcement is None:
+                results[str(announcement_id)] = {'success': False, 'message': '公告不存在'}
+                continue
+            targets.append(announcement_id)
+            operations.append(_bulk_operation(action, announcement, category, now))
+
+        failed = {}
+        if operations:
+            try:
+                mongo.db.announcements.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    failed[targets[error['index']]] = error.get('errmsg', '写入失败')
+
+        succeeded = [announcement_id for announcement_id in targets if announcement_id not in failed]
+        for announcement_id in targets:
+            if announcement_id in failed:
+                results[str(announcement_id)] = {'success': False, 'message': failed[announcement_id]}
+            else:
+                results[str(announcement_id)] = {'success': True, 'message': BULK_ACTIONS[action] + '成功'}
+
+        if succeeded:
+            counters.track_changes(mongo.db, 'announcements', [
+                (announcements[announcement_id], _bulk_result(action, announcements[announcement_id], category))
+                for announcement_id in succeeded
+            ])
+            if action == 'delete':
+                search_index.remove_announcements(mongo.db, succeeded)
+            elif action in ('publish', 'unpublish'):
+                search_index.update_statuses(mongo.db, succeeded,
+                                             'published' if action == 'publish' else 'draft')
+            announcements_changed(mongo)
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'批量操作时发生错误: {str(e)}'})
+
+    return jsonify({
+        'success': len(succeeded) > 0,
+        'message': f'{BULK_ACTIONS[action]}：成功 {len(succeeded)} 条，失败 {len(results) - len(succeeded)} 条',
+        'succeeded': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'results': [dict(results[raw_id], id=raw_id) for raw_id in requested]
+    })
@@ -3,7 +3,9 @@ from flask_login import login_user, logout_user, login_required, current_user
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from utils.mailer import send_verification_email
 from datetime import datetime
-from werkzeug.security import generate_password_hash
+from utils.hashing import hashing_pool, HashingPoolSaturated
+from pymongo.errors import DuplicateKeyError
+from models.user import LOGIN_PROJECTION, EXISTS_PROJECTION
 #from werkzeug.security import check_password_hash
 
 auth_bp = Blueprint('auth', __name__)
@@ -40,26 +42,37 @@ def register():
 
         # 检查用户名和邮箱是否已存在
         User = get_user_model()
-        if User.get_by_username(get_mongo(), username):
+        if User.get_by_username(get_mongo(), username, projection=EXISTS_PROJECTION):
             flash('用户名已存在', 'danger')
             return render_template('register.html')
 
-        if User.get_by_email(get_mongo(), email):
+        if User.get_by_email(get_mongo(), email, projection=EXISTS_PROJECTION):
             flash('邮箱已被注册', 'danger')
             return render_template('register.html')
 
+        try:
+            password_hash = hashing_pool.generate_password_hash(password)
+        except HashingPoolSaturated:
+            flash('系统繁忙，请稍后重试', 'warning')
+            return render_template('register.html'), 503
+
         # 创建用户（但未激活）
         user_data = {
             'username': username,
             'email': email,
-            'password_hash': generate_password_hash(password),  # 这里改为 password_hash
+            'password_hash': password_hash,  # 这里改为 password_hash
             'is_active': False,
             'is_admin': False,
             'email_verified': False,
             'created_at': datetime.utcnow()
         }
 
-        user = User.create(get_mongo(), user_data)
+        try:
+            user = User.create(get_mongo(), user_data)
+        except DuplicateKeyError:
+            # 并发注册时由唯一索引兜底
+            flash('用户名或邮箱已被注册', 'danger')
+            return render_template('register.html')
 
         # 发送验证邮件
         if send_verification_email(user):
@@ -145,14 +158,18 @@ def login():
 
         User = get_user_model()
 
-        # 先尝试按用户名查找
-        user = User.get_by_username(get_mongo(), identifier)
+        # 按用户名或邮箱查找（一次查询）
+        user = User.get_by_login(get_mongo(), identifier)
 
-        # 如果按用户名没找到，再尝试按邮箱查找
-        if not user:
-            user = User.get_by_email(get_mongo(), identifier.lower())
+        try:
+            password_ok = bool(user) and user.check_password(password)
+        except HashingPoolSaturated:
+            flash('系统繁忙，请稍后重试', 'warning')
+            return render_template('auth/login.html'), 503
+
+        if password_ok:
+            user.rehash_password_if_needed(get_mongo(), password)
 
-        if user and user.check_password(password):
             # 检查邮箱验证
             if hasattr(user, 'email_verified') and not user.email_verified:
                 flash('请先验证您的邮箱才能登录', 'warning')
@@ -192,9 +209,17 @@ def admin_login():
         password = request.form.get('password', '')
 
         User = get_user_model()
-        user = User.get_by_email(get_mongo(), email)
+        user = User.get_by_email(get_mongo(), email, projection=LOGIN_PROJECTION)
+
+        try:
+            password_ok = bool(user) and user.check_password(password)
+        except HashingPoolSaturated:
+            flash('系统繁忙，请稍后重试', 'warning')
+            return render_template('auth/admin_login.html'), 503
+
+        if password_ok:
+            user.rehash_password_if_needed(get_mongo(), password)
 
-        if user and user.check_password(password):
             # 🔥 关键修改：必须是管理员才能登录
             if not user.is_admin:
                 flash('此页面仅限管理员访问', 'danger')
@@ -224,8 +249,8 @@ def logout():
     flash('您已成功退出登录。', 'success')
 
     response = redirect(url_for('auth.login'))
+    # 会话Cookie由会话接口管理（退出时更换会话ID），这里不再删除
     response.delete_cookie('flask_session')
-    response.delete_cookie('session')
     response.delete_cookie('remember_token')
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
 
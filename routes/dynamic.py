@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, jsonify, flash, redirect,
 from flask_login import login_required, current_user
 from bson import ObjectId
 from datetime import datetime
+from utils.menu_cache import menu_cache
 
 dynamic_bp = Blueprint('dynamic', __name__, url_prefix='/admin/dynamic')
 
@@ -125,6 +126,7 @@ def add_function():
 
         # 保存到数据库
         mongo.db.dynamic_functions.insert_one(function_data)
+        menu_cache.bump_version(mongo)
 
         flash(f'功能"{title}"添加成功！', 'success')
         return redirect(url_for('dynamic.function_list'))
@@ -201,6 +203,7 @@ def edit_function(function_id):
                 {'_id': ObjectId(function_id)},
                 {'$set': update_data}
             )
+            menu_cache.bump_version(mongo)
 
             flash('功能更新成功！', 'success')
             return redirect(url_for('dynamic.function_list'))
@@ -236,6 +239,7 @@ def delete_function(function_id):
 
     try:
         result = mongo.db.dynamic_functions.delete_one({'_id': ObjectId(function_id)})
+        menu_cache.bump_version(mongo)
 
         if result.deleted_count > 0:
             return jsonify({'success': True, 'message': '功能删除成功'})
@@ -274,6 +278,7 @@ def toggle_function(function_id):
                 'updated_by': current_user.email
             }}
         )
+        menu_cache.bump_version(mongo)
 
         status_text = '激活' if new_status else '禁用'
         return jsonify({
@@ -2,6 +2,10 @@ from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required, current_user
 from config.admin_menu import get_public_menu, get_user_menu, get_admin_menu
 from datetime import datetime
+from models.announcement import LIST_PROJECTION
+from routes.announcements import convert_announcement_data
+from utils.http_cache import conditional_page
+from utils.announcement_cache import announcement_cache
 
 main_bp = Blueprint('main', __name__)
 
@@ -20,24 +24,22 @@ def index():
 
 @main_bp.route('/home')
 @login_required
+@conditional_page()
 def home():
     """用户主页"""
     from flask import current_app
     mongo = current_app.mongo
 
-    # 获取最近公告
-    recent_announcements = list(mongo.db.announcements.find(
-        {'status': 'published'}
-    ).sort('publish_time', -1).limit(5))
+    # 获取最近公告（优先从已发布公告读模型读取）
+    recent_announcements = announcement_cache.recent(mongo, 5)
+    if recent_announcements is None:
+        recent_announcements = list(mongo.db.announcements.find(
+            {'status': 'published'}, LIST_PROJECTION
+        ).sort('publish_time', -1).limit(5))
 
-    # 处理公告数据
+    # 处理公告数据（摘要和发布时间在写入时已计算）
     for ann in recent_announcements:
-        ann['_id'] = str(ann['_id'])
-        ann['publish_time_str'] = ann['publish_time'].strftime('%Y-%m-%d %H:%M')
-        if 'content' in ann and len(ann['content']) > 100:
-            ann['summary'] = ann['content'][:100] + '...'
-        else:
-            ann['summary'] = ann.get('content', '')
+        convert_announcement_data(ann)
 
     # 获取菜单
     if hasattr(current_user, 'is_admin') and current_user.is_admin:
@@ -1,8 +1,9 @@
 # routes/user.py
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
-from werkzeug.security import generate_password_hash
+from utils.hashing import hashing_pool, HashingPoolSaturated
 from config.admin_menu import get_user_menu  # 导入菜单函数
+from models.user import EXISTS_PROJECTION
 
 user_bp = Blueprint('user', __name__)
 
@@ -49,7 +50,7 @@ def update_profile():
     # 检查用户名是否已被其他人使用
     mongo = get_mongo()
     User = get_user_model()
-    existing_user = User.get_by_username(mongo, username)
+    existing_user = User.get_by_username(mongo, username, projection=EXISTS_PROJECTION)
     if existing_user and existing_user.id != current_user.id:
         flash('该用户名已被使用，请选择其他用户名', 'danger')
         return redirect(url_for('user.profile'))
@@ -98,18 +99,22 @@ def change_password():
         flash('新密码至少需要6位', 'danger')
         return redirect(url_for('user.profile'))
 
-    # 验证当前密码
-    if not current_user.check_password(current_password):
-        flash('当前密码错误', 'danger')
+    try:
+        # 验证当前密码
+        if not current_user.check_password(current_password):
+            flash('当前密码错误', 'danger')
+            return redirect(url_for('user.profile'))
+
+        # 生成新的密码哈希
+        new_password_hash = hashing_pool.generate_password_hash(new_password)
+    except HashingPoolSaturated:
+        flash('系统繁忙，请稍后重试', 'warning')
         return redirect(url_for('user.profile'))
 
     # 使用User模型的update方法更新密码
     mongo = get_mongo()
     User = get_user_model()
 
-    # 生成新的密码哈希
-    new_password_hash = generate_password_hash(new_password)
-
     # 更新数据库
     User.update(mongo, current_user.id, {'password_hash': new_password_hash})
 
@@ -0,0 +1,50 @@
+"""
+需要本地 MongoDB 的测试（连接方式与 test_db.py 相同），均标记为 mongodb
+运行：python -m pytest tests
+
+MongoDB 未启动时这些测试显示为跳过（skipped），跳过不代表通过。
+CI 中设置 TEST_REQUIRE_MONGO=1，连接不上时直接失败而不是跳过。
+"""
+
+import os
+import sys
+
+import pymongo
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MONGO_URI = os.environ.get('TEST_MONGO_URI', 'mongodb://127.0.0.1:27017/')
+TEST_DB_NAME = 'myweb_test'
+REQUIRE_MONGO = os.environ.get('TEST_REQUIRE_MONGO', '').lower() in ('1', 'true')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'mongodb: 需要本地 MongoDB，未启动时跳过（TEST_REQUIRE_MONGO=1 时失败）')
+
+
+def pytest_collection_modifyitems(items):
+    for item in items:
+        if 'mongo_db' in getattr(item, 'fixturenames', ()):
+            item.add_marker(pytest.mark.mongodb)
+
+
+@pytest.fixture(scope='session')
+def mongo_client():
+    client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except pymongo.errors.ConnectionFailure as e:
+        if REQUIRE_MONGO:
+            pytest.fail(f"TEST_REQUIRE_MONGO 已设置但 MongoDB 未启动: {e}")
+        pytest.skip(f"MongoDB 未启动（跳过不代表通过）: {e}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def mongo_db(mongo_client):
+    """每个测试使用一个空的测试库，结束后删除"""
+    mongo_client.drop_database(TEST_DB_NAME)
+    yield mongo_client[TEST_DB_NAME]
+    mongo_client.drop_database(TEST_DB_NAME)
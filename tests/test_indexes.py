@@ -0,0 +1,53 @@
+"""索引注册表：同步后生产查询形状都应命中索引"""
+
+from datetime import datetime, timedelta
+
+from utils import user_search
+from utils.indexes import INDEXES, sync_indexes, verify_query_shapes
+
+
+def _seed(db):
+    now = datetime(2024, 1, 1)
+    db.announcements.insert_many([
+        {'title': f'公告{i}', 'status': 'published' if i % 2 else 'draft', 'category': '通知',
+         'is_pinned': i % 5 == 0, 'publish_time': now - timedelta(days=i),
+         'created_at': now - timedelta(days=i), 'author_id': 'admin'}
+        for i in range(50)
+    ])
+    db.users.insert_many([
+        dict({'username': f'user{i}', 'email': f'user{i}@example.com', 'email_verified': i % 2 == 0,
+              'is_admin': False, 'is_active': True, 'created_at': now - timedelta(days=i)},
+             **user_search.search_fields(f'user{i}', f'user{i}@example.com'))
+        for i in range(50)
+    ])
+    db.dynamic_functions.insert_many([
+        {'name': f'func{i}', 'menu_level': 1, 'is_active': True, 'show_in_menu': True, 'menu_order': i}
+        for i in range(10)
+    ])
+
+
+def test_sync_is_idempotent(mongo_db):
+    sync_indexes(mongo_db, drop_unknown=True)
+    report = sync_indexes(mongo_db, drop_unknown=True)
+    for collection, items in report.items():
+        assert all(action == 'ok' for _, action in items), (collection, items)
+
+
+def test_startup_sync_does_not_rebuild(mongo_db):
+    spec = INDEXES['announcements'][0]
+    mongo_db.announcements.create_index([('status', 1)], name=spec.name)
+
+    report = sync_indexes(mongo_db, collections=['announcements'], repair=False)
+
+    assert (spec.name, 'drifted') in report['announcements']
+    assert mongo_db.announcements.index_information()[spec.name]['key'] == [('status', 1)]
+
+
+def test_query_shapes_use_indexes(mongo_db):
+    _seed(mongo_db)
+    sync_indexes(mongo_db, drop_unknown=True)
+
+    # 全表扫描（COLLSCAN）和内存排序（SORT）都视为未命中索引
+    failures = [f"{shape.collection}: {shape.description} -> {', '.join(problems)}"
+                for shape, problems in verify_query_shapes(mongo_db) if problems]
+    assert not failures, failures
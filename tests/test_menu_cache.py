@@ -0,0 +1,36 @@
+"""菜单缓存：一个进程递增共享版本号后，其他进程在检查间隔内重建菜单"""
+
+import time
+from types import SimpleNamespace
+
+from utils.menu_cache import MenuCache
+
+CHECK_INTERVAL = 1
+
+
+def _function(name, order):
+    return {'name': name, 'title': name, 'menu_level': 1, 'menu_order': order,
+            'is_active': True, 'show_in_menu': True, 'access_level': 'public'}
+
+
+def test_other_instance_rebuilds_after_bump(mongo_db):
+    mongo = SimpleNamespace(db=mongo_db)
+    mongo_db.dynamic_functions.insert_one(_function('home', 1))
+
+    writer = MenuCache(check_interval=CHECK_INTERVAL)
+    reader = MenuCache(check_interval=CHECK_INTERVAL)
+    assert [func['name'] for func in reader.get_functions(mongo)] == ['home']
+    writer.get_functions(mongo)
+
+    mongo_db.dynamic_functions.insert_one(_function('news', 2))
+    writer.bump_version(mongo)
+    assert [func['name'] for func in writer.get_functions(mongo)] == ['home', 'news']
+
+    deadline = time.monotonic() + CHECK_INTERVAL + 0.5
+    names = []
+    while time.monotonic() < deadline:
+        names = [func['name'] for func in reader.get_functions(mongo)]
+        if names == ['home', 'news']:
+            break
+        time.sleep(0.1)
+    assert names == ['home', 'news']
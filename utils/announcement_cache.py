@@ -0,0 +1,214 @@
+"""
+已发布公告的进程内读模型
+已发布公告数量少、读多写少，首页（最近5条）、公告列表（分页）和公告详情直接从内存读取：
+- 列表快照：按展示顺序（置顶、发布时间、_id）排好的已发布公告（不含正文），
+  最多 ANNOUNCEMENT_CACHE_MAX_ITEMS 条；超出部分的翻页回退到MongoDB游标分页
+- 正文缓存：详情页读取过的正文按 LRU 保留，总大小不超过 ANNOUNCEMENT_CACHE_CONTENT_BYTES；
+  未缓存的正文（冷数据）从MongoDB读取后放入缓存
+
+公告写入时递增 'announcements' 共享版本号，读模型发现版本变化后在下一次读取时整体重建；
+快照另有最长有效期 ANNOUNCEMENT_CACHE_MAX_AGE 秒兜底，覆盖脚本等未递增版本号的写入；
+查看次数写入数据库时由 view_counter 通知读模型同步累加。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from bson import ObjectId
+
+from models.announcement import LIST_PROJECTION
+from utils.cache_versions import announcements_version
+from utils.pagination import ANNOUNCEMENT_SORT, KeysetPage, encode_cursor, decode_cursor
+
+PUBLISHED_QUERY = {'status': 'published'}
+
+
+class AnnouncementSnapshot:
+    """某一版本的已发布公告列表（只读）"""
+
+    def __init__(self, version, items, complete, expires_at):
+        self.version = version
+        self.expires_at = expires_at
+        self.items = items
+        # complete 为 True 表示已包含全部已发布公告
+        self.complete = complete
+        self.positions = {item['_id']: index for index, item in enumerate(items)}
+        # 首页"最近公告"按发布时间倒序
+        self.by_time = sorted(items, key=lambda item: item.get('publish_time') or datetime.min, reverse=True)
+
+
+class AnnouncementReadModel:
+    """已发布公告读模型"""
+
+    def __init__(self, max_items=1000, max_content_bytes=4 * 1024 * 1024, max_age=300):
+        self.max_items = max_items
+        self.max_content_bytes = max_content_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._snapshot = None
+        self._contents = OrderedDict()
+        self._content_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.max_items = app.config.get('ANNOUNCEMENT_CACHE_MAX_ITEMS', self.max_items)
+        self.max_content_bytes = app.config.get('ANNOUNCEMENT_CACHE_CONTENT_BYTES', self.max_content_bytes)
+        self.max_age = app.config.get('ANNOUNCEMENT_CACHE_MAX_AGE', self.max_age)
+
+    def invalidate(self):
+        """只使本进程的读模型失效"""
+        with self._lock:
+            self._snapshot = None
+            self._contents.clear()
+            self._content_bytes = 0
+
+    @staticmethod
+    def _is_current(snapshot, version):
+        return snapshot is not None and snapshot.version == version and time.monotonic() < snapshot.expires_at
+
+    def _get_snapshot(self, mongo):
+        version = announcements_version.current(mongo)[0]
+        snapshot = self._snapshot
+        if self._is_current(snapshot, version):
+            return snapshot
+
+        # 同一时间只由一个线程重建，其他线程等待后直接使用新快照
+        with self._build_lock:
+            snapshot = self._snapshot
+            if self._is_current(snapshot, version):
+                return snapshot
+
+            items = list(mongo.db.announcements.find(PUBLISHED_QUERY, LIST_PROJECTION)
+                         .sort(list(ANNOUNCEMENT_SORT))
+                         .limit(self.max_items + 1))
+            complete = len(items) <= self.max_items
+            snapshot = AnnouncementSnapshot(version, items[:self.max_items], complete,
+                                            time.monotonic() + self.max_age)
+
+            with self._lock:
+                # 版本变化后正文也可能被编辑过
+                self._contents.clear()
+                self._content_bytes = 0
+                self._snapshot = snapshot
+            return snapshot
+
+    def recent(self, mongo, limit=5):
+        """按发布时间倒序的最近公告；快照不完整时返回 None（由调用方查询数据库）"""
+        snapshot = self._get_snapshot(mongo)
+        if not snapshot.complete:
+            return None
+        return [dict(item) for item in snapshot.by_time[:limit]]
+
+    def count(self, mongo):
+        """已发布公告总数；快照不完整时返回 None"""
+        snapshot = self._get_snapshot(mongo)
+        return len(snapshot.items) if snapshot.complete else None
+
+    def page(self, mongo, per_page, cursor=None):
+        """与 keyset_paginate 相同的翻页（令牌可互换）；超出快照范围时返回 None"""
+        snapshot = self._get_snapshot(mongo)
+        items = snapshot.items
+
+        state = decode_cursor(cursor)
+        if state is None:
+            start, page = 0, 1
+        else:
+            # 边界公告已不在快照中（如已撤回）时交给数据库分页
+            boundary = snapshot.positions.get(state['v'][-1]) if state['v'] else None
+            if boundary is None:
+                return None
+            page = state['p']
+            if state['d'] == 'next':
+                start = boundary + 1
+            else:
+                start = max(0, boundary - per_page)
+
+        end = start + per_page
+        if end >= len(items) and not snapshot.complete:
+            return None
+
+        page_items = [dict(item) for item in items[start:end]]
+        if not page_items:
+            return KeysetPage([], page)
+
+        def values_of(doc):
+            return [doc.get(field) for field, _ in ANNOUNCEMENT_SORT]
+
+        next_cursor = encode_cursor('next', values_of(page_items[-1]), page + 1) if end < len(items) else None
+        prev_cursor = encode_cursor('prev', values_of(page_items[0]), page - 1) if start > 0 and page > 1 else None
+        return KeysetPage(page_items, page, next_cursor, prev_cursor)
+
+    def get(self, mongo, announcement_id):
+        """已发布公告的完整文档；不存在或未发布时返回 None"""
+        snapshot = self._get_snapshot(mongo)
+        position = snapshot.positions.get(announcement_id)
+        if position is None and snapshot.complete:
+            return None
+
+        with self._lock:
+            content = self._contents.get(announcement_id)
+            if content is not None:
+                self._contents.move_to_end(announcement_id)
+                self.hits += 1
+
+        if position is not None and content is not None:
+            return dict(snapshot.items[position], content=content)
+
+        # 冷数据：从数据库读取
+        with self._lock:
+            self.misses += 1
+        announcement = mongo.db.announcements.find_one({'_id': announcement_id, 'status': 'published'})
+        if announcement is not None and position is not None:
+            self._remember_content(announcement_id, announcement.get('content', ''))
+        return announcement
+
+    def _remember_content(self, announcement_id, content):
+        size = len(content.encode('utf-8'))
+        if size > self.max_content_bytes:
+            return
+
+        with self._lock:
+            previous = self._contents.pop(announcement_id, None)
+            if previous is not None:
+                self._content_bytes -= len(previous.encode('utf-8'))
+            self._contents[announcement_id] = content
+            self._content_bytes += size
+            while self._content_bytes > self.max_content_bytes:
+                _, evicted = self._contents.popitem(last=False)
+                self._content_bytes -= len(evicted.encode('utf-8'))
+
+    def apply_views(self, counts):
+        """查看次数写入数据库后同步到快照（counts: {公告ID字符串: 增量}）"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        with self._lock:
+            for announcement_id, count in counts.items():
+                position = snapshot.positions.get(ObjectId(announcement_id))
+                if position is not None:
+                    item = snapshot.items[position]
+                    item['view_count'] = item.get('view_count', 0) + count
+
+    def stats(self):
+        snapshot = self._snapshot
+        with self._lock:
+            return {
+                'items': len(snapshot.items) if snapshot else 0,
+                'complete': snapshot.complete if snapshot else None,
+                'version': snapshot.version if snapshot else None,
+                'max_items': self.max_items,
+                'cached_contents': len(self._contents),
+                'content_bytes': self._content_bytes,
+                'max_content_bytes': self.max_content_bytes,
+                'max_age': self.max_age,
+                'content_hits': self.hits,
+                'content_misses': self.misses
+            }
+
+
+# 全局已发布公告读模型
+announcement_cache = AnnouncementReadModel()
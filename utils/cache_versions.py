@@ -0,0 +1,97 @@
+"""
+共享缓存版本号
+各进程的本地缓存通过 cache_versions 集合中的版本文档判断数据是否已被其他进程修改，
+每种缓存对应一个文档：{'_id': 名称, 'version': 整数, 'updated_at': 时间}
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+def get_version(mongo, name):
+    """读取共享版本号，文档不存在时返回0"""
+    return get_version_info(mongo, name)[0]
+
+
+def get_version_info(mongo, name):
+    """读取共享版本号和最后更新时间，文档不存在时返回 (0, None)"""
+    doc = mongo.db.cache_versions.find_one({'_id': name})
+    if not doc:
+        return 0, None
+    return doc.get('version', 0), doc.get('updated_at')
+
+
+def bump_version(mongo, name):
+    """递增共享版本号并返回新值"""
+    doc = mongo.db.cache_versions.find_one_and_update(
+        {'_id': name},
+        {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc['version']
+
+
+class SharedVersion:
+    """进程内跟踪的共享版本号
+    本进程写入后调用 bump 立即生效；其他进程的写入最多 check_interval 秒后可见。
+    """
+
+    def __init__(self, name, check_interval=5, config_key=None):
+        self.name = name
+        self.check_interval = check_interval
+        self.config_key = config_key
+        self._lock = threading.Lock()
+        self._version = None
+        self._updated_at = None
+        self._next_check = 0.0
+
+    def init_app(self, app):
+        if self.config_key:
+            self.check_interval = app.config.get(self.config_key, self.check_interval)
+
+    def bump(self, mongo):
+        """数据写入后调用，返回新版本号"""
+        try:
+            version = bump_version(mongo, self.name)
+        except PyMongoError as e:
+            logger.error(f"更新共享版本号失败({self.name}): {e}")
+            return self._version
+
+        with self._lock:
+            self._version = version
+            self._updated_at = datetime.utcnow()
+            # 本进程的值已是最新，推迟下一次检查
+            self._next_check = time.monotonic() + self.check_interval
+        return version
+
+    def current(self, mongo):
+        """返回 (版本号, 最后更新时间)，按间隔从数据库刷新"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                version, updated_at = get_version_info(mongo, self.name)
+            except PyMongoError as e:
+                logger.warning(f"读取共享版本号失败({self.name}): {e}")
+            else:
+                with self._lock:
+                    self._version = version
+                    self._updated_at = updated_at
+
+        with self._lock:
+            return self._version, self._updated_at
+
+
+# 公告数据版本（公告的任何写入都会递增，用于总数缓存和页面校验值）
+announcements_version = SharedVersion('announcements', config_key='ANNOUNCEMENT_VERSION_CHECK_INTERVAL')
+
+# 查看次数版本（任一进程把缓冲的查看次数写入数据库后递增，用于页面校验值）
+views_version = SharedVersion('views', config_key='ANNOUNCEMENT_VERSION_CHECK_INTERVAL')
@@ -0,0 +1,177 @@
+"""
+增量维护的统计计数器
+counters 集合中每个维度一个文档，管理后台只读取这些文档（按 _id 查找，与数据量无关）：
+- 'users'：{total, verified, unverified, admins, active, inactive}（定义见 utils/user_stats.py）
+- 'announcements'：{total, status: {状态: 数量}, category: {分类: 数量}}
+
+写入用户或公告时，按文档修改前后计入的统计项之差用一次 $inc 原子更新计数器。
+$inc 不使用 upsert：计数器文档不存在时（新部署）忽略增量，第一次读取时全量计算并写入。
+
+脚本直接修改数据、或并发修改同一文档时计数可能出现偏差，用校准命令从头重新计算：
+python database_upgrade.py counters
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+from models.announcement import CATEGORIES
+from utils.user_stats import STAT_NAMES, compute_user_stats, user_stat_names
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_COLLECTION = 'counters'
+
+ANNOUNCEMENT_STATUSES = ('published', 'draft')
+OTHER_CATEGORY = '其他'
+
+# 计算用户统计项需要的字段
+USER_COUNTER_PROJECTION = {'email_verified': 1, 'is_admin': 1, 'is_active': 1}
+
+# 计算公告统计项需要的字段
+ANNOUNCEMENT_COUNTER_PROJECTION = {'status': 1, 'category': 1}
+
+
+def _status_key(status):
+    return status if status in ANNOUNCEMENT_STATUSES else 'draft'
+
+
+def _category_key(category):
+    # 分类会成为字段名，只接受预定义分类
+    category = category or CATEGORIES[0]
+    return category if category in CATEGORIES else OTHER_CATEGORY
+
+
+def announcement_counter_names(announcement):
+    """一条公告计入的计数器字段"""
+    return [
+        'total',
+        f"status.{_status_key(announcement.get('status'))}",
+        f"category.{_category_key(announcement.get('category'))}"
+    ]
+
+
+COUNTER_NAMES = {
+    'users': user_stat_names,
+    'announcements': announcement_counter_names,
+}
+
+
+def counter_deltas(name, before=None, after=None):
+    """文档从 before 变为 after（None 表示不存在）时各计数器字段的增量"""
+    names_of = COUNTER_NAMES[name]
+    deltas = Counter()
+    if before is not None:
+        deltas.subtract(names_of(before))
+    if after is not None:
+        deltas.update(names_of(after))
+    return {field: delta for field, delta in deltas.items() if delta}
+
+
+def apply_deltas(db, name, deltas):
+    """用一次 $inc 更新计数器；计数器只用于展示，失败时只记录日志"""
+    if not deltas:
+        return
+    try:
+        db[COUNTERS_COLLECTION].update_one({'_id': name}, {'$inc': deltas})
+    except PyMongoError as e:
+        logger.error(f"更新计数器 {name} 失败（可运行校准命令修正）: {e}")
+
+
+def track_change(db, name, before=None, after=None):
+    """记录一个文档的创建（before=None）、修改或删除（after=None）"""
+    apply_deltas(db, name, counter_deltas(name, before, after))
+
+
+def track_changes(db, name, changes):
+    """记录多个文档的变化 [(before, after)]，合并为一次 $inc"""
+    total = Counter()
+    for before, after in changes:
+        total.update(counter_deltas(name, before, after))
+    apply_deltas(db, name, {field: delta for field, delta in total.items() if delta})
+
+
+def delete_users(db, query):
+    """删除符合条件的用户并更新计数器，返回删除数
+
+    先读取统计字段再按 _id 删除；删除数与读取数不一致（期间有并发修改）时重新校准用户计数器。
+    """
+    users = list(db.users.find(query, USER_COUNTER_PROJECTION))
+    if not users:
+        return 0
+
+    result = db.users.delete_many(dict(query, _id={'$in': [user['_id'] for user in users]}))
+    if result.deleted_count == len(users):
+        track_changes(db, 'users', [(user, None) for user in users])
+    else:
+        reconcile_counters(db, ['users'])
+    return result.deleted_count
+
+
+def compute_announcement_counts(db):
+    """从 announcements 集合全量计算公告计数器"""
+    counts = {'total': 0, 'status': dict.fromkeys(ANNOUNCEMENT_STATUSES, 0),
+              'category': dict.fromkeys(CATEGORIES, 0)}
+    pipeline = [
+        {'$group': {
+            '_id': {'status': '$status', 'category': '$category'},
+            'count': {'$sum': 1}
+        }}
+    ]
+    for row in db.announcements.aggregate(pipeline):
+        status = _status_key(row['_id'].get('status'))
+        category = _category_key(row['_id'].get('category'))
+        counts['total'] += row['count']
+        counts['status'][status] += row['count']
+        counts['category'][category] = counts['category'].get(category, 0) + row['count']
+    return counts
+
+
+RECONCILERS = {
+    'users': lambda db: compute_user_stats(db.users),
+    'announcements': compute_announcement_counts,
+}
+
+
+def reconcile_counters(db, names=None):
+    """从头重新计算计数器并覆盖保存，返回 {维度: 计数}"""
+    result = {}
+    for name in names or RECONCILERS:
+        counts = RECONCILERS[name](db)
+        db[COUNTERS_COLLECTION].replace_one(
+            {'_id': name},
+            dict(counts, reconciled_at=datetime.utcnow()),
+            upsert=True
+        )
+        result[name] = counts
+    return result
+
+
+def read_counters(db, name):
+    """读取计数器文档；不存在时先全量计算"""
+    doc = db[COUNTERS_COLLECTION].find_one({'_id': name})
+    if doc is None:
+        return reconcile_counters(db, [name])[name]
+    return doc
+
+
+def user_counts(db):
+    """管理后台的用户统计 {统计项: 数量}"""
+    doc = read_counters(db, 'users')
+    return {name: max(doc.get(name, 0), 0) for name in STAT_NAMES}
+
+
+def announcement_summary(db):
+    """管理后台的公告统计（总数及按状态、分类的数量）"""
+    doc = read_counters(db, 'announcements')
+    by_status = {status: count for status, count in doc.get('status', {}).items() if count > 0}
+    by_category = {category: count for category, count in doc.get('category', {}).items() if count > 0}
+    return {
+        'total': max(doc.get('total', 0), 0),
+        'published': by_status.get('published', 0),
+        'draft': by_status.get('draft', 0),
+        'by_status': by_status,
+        'by_category': by_category
+    }
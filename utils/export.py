@@ -0,0 +1,106 @@
+"""
+流式数据导出（CSV / NDJSON）
+管理后台导出用户和公告时不把结果读入列表，而是边从游标读取边输出：
+- 游标只取导出的字段（projection），每批读取 EXPORT_BATCH_SIZE 条
+- 每累计 EXPORT_CHUNK_ROWS 行输出一次，响应不设置长度，以分块传输方式发送
+无论导出多少行，进程内只保留一批文档和一个输出块，内存占用不变。
+
+CSV 会被 Excel 打开，以 = + - @ 制表符或回车开头的文本单元格会被当作公式执行（CSV 注入），
+这类单元格前加单引号按文本显示。
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from flask import current_app, Response, stream_with_context
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# Excel 需要 BOM 才能正确识别 UTF-8 编码的中文
+CSV_BOM = '\ufeff'
+
+# 电子表格会当作公式处理的单元格开头字符
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_projection(fields):
+    """导出字段对应的查询投影"""
+    projection = {field: 1 for _, field in fields}
+    if '_id' not in projection:
+        projection['_id'] = 0
+    return projection
+
+
+def _plain_value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _csv_value(value):
+    value = _plain_value(value)
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        value = ','.join(str(item) for item in value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(cursor, fields, chunk_rows):
+    """逐块生成 CSV 文本（第一块包含表头）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write(CSV_BOM)
+    writer.writerow([header for header, _ in fields])
+
+    rows = 0
+    for doc in cursor:
+        writer.writerow([_csv_value(doc.get(field)) for _, field in fields])
+        rows += 1
+        if rows >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(cursor, fields, chunk_rows):
+    """逐块生成 NDJSON 文本（每行一个 JSON 对象，键为字段名）"""
+    lines = []
+    for doc in cursor:
+        row = {field: _plain_value(doc.get(field)) for _, field in fields}
+        lines.append(json.dumps(row, ensure_ascii=False, default=str))
+        if len(lines) >= chunk_rows:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_response(cursor, fields, filename, export_format='csv'):
+    """把游标以流式响应导出；fields 为 [(表头, 字段名)]"""
+    config = current_app.config
+    cursor = cursor.batch_size(config.get('EXPORT_BATCH_SIZE', 1000))
+    chunk_rows = config.get('EXPORT_CHUNK_ROWS', 500)
+
+    chunks = ndjson_chunks if export_format == 'ndjson' else csv_chunks
+    extension = 'ndjson' if export_format == 'ndjson' else 'csv'
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    response = Response(stream_with_context(chunks(cursor, fields, chunk_rows)),
+                        content_type=FORMATS.get(export_format, FORMATS['csv']))
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}_{timestamp}.{extension}'
+    # 禁止反向代理缓冲整个响应
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,105 @@
+"""
+密码哈希线程池
+密码哈希/校验（算法见 utils/passwords.py）是CPU密集操作，统一交给有界线程池执行：
+- 同时执行和排队的任务总数有上限，超过时立即抛出 HashingPoolSaturated，由调用方返回"系统繁忙"
+- 按操作类型记录次数、平均耗时、最大耗时（含排队时间）和被拒绝次数
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from utils.passwords import password_hasher
+
+
+class HashingPoolSaturated(Exception):
+    """哈希线程池已满"""
+
+
+class PasswordHashingPool:
+    """有界的密码哈希线程池"""
+
+    def __init__(self, max_workers=4, max_queue=16, timeout=10):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._metrics = {}
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS', self.max_workers)
+        self.max_queue = app.config.get('PASSWORD_HASH_QUEUE', self.max_queue)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+
+    def _get_executor(self):
+        # 线程不会跨 fork 保留，每个worker进程各自创建线程池
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            with self._lock:
+                if self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='password-hash')
+                    self._executor_pid = pid
+        return self._executor
+
+    def _record(self, operation, elapsed_ms):
+        with self._lock:
+            metric = self._metrics.setdefault(operation, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            metric['count'] += 1
+            metric['total_ms'] += elapsed_ms
+            metric['max_ms'] = max(metric['max_ms'], elapsed_ms)
+
+    def run(self, operation, func, *args):
+        """在线程池中执行 func(*args) 并等待结果；线程池已满时立即失败"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolSaturated(operation)
+
+        start = time.perf_counter()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingPoolSaturated(operation)
+        finally:
+            self._record(operation, (time.perf_counter() - start) * 1000)
+
+    def check_password(self, password_hash, password):
+        return self.run('verify', password_hasher.verify_password, password_hash, password)
+
+    def generate_password_hash(self, password):
+        return self.run('hash', password_hasher.hash_password, password)
+
+    def stats(self):
+        with self._lock:
+            operations = {
+                name: {
+                    'count': metric['count'],
+                    'avg_ms': round(metric['total_ms'] / metric['count'], 2) if metric['count'] else 0.0,
+                    'max_ms': round(metric['max_ms'], 2)
+                }
+                for name, metric in self._metrics.items()
+            }
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'rejected': self.rejected,
+                'operations': operations
+            }
+
+
+# 全局密码哈希线程池
+hashing_pool = PasswordHashingPool()
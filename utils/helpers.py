@@ -1,5 +1,8 @@
 from datetime import datetime
 
+from flask import g
+from werkzeug.local import LocalProxy
+
 
 def format_datetime(value, format='%Y-%m-%d %H:%M:%S'):
     if isinstance(value, str):
@@ -10,4 +13,15 @@ def format_datetime(value, format='%Y-%m-%d %H:%M:%S'):
 
     if isinstance(value, datetime):
         return value.strftime(format)
-    return value
\ No newline at end of file
+    return value
+
+
+def lazy_request_value(name, factory):
+    """返回惰性代理：首次访问时才调用 factory，结果缓存在 flask.g 上供本次请求复用"""
+    def _resolve():
+        values = g.setdefault('_lazy_request_values', {})
+        if name not in values:
+            values[name] = factory()
+        return values[name]
+
+    return LocalProxy(_resolve)
@@ -0,0 +1,115 @@
+"""
+页面条件请求（ETag / Last-Modified → 304）
+公告相关页面的内容只取决于公告数据、查看次数、菜单、当前用户和部署的模板，因此先用这些数据的版本号计算校验值：
+- ETag：公告共享版本号 + 查看次数版本号 + 菜单共享版本号 + 用户（ID、用户名、邮箱、访问级别）
+  + 部署标识 + 请求路径的摘要
+- Last-Modified：公告共享版本号的最后更新时间
+客户端缓存仍然有效时直接返回 304，不再查询公告也不渲染模板。
+
+查看次数由 view_counter 缓冲写入，不递增公告版本号；每次写入后递增查看次数版本号（views_version），
+页面上的次数最多延迟一个写入间隔加一个版本检查间隔。
+部署标识取 BUILD_ID 配置（发布时设置）；未配置时为模板文件路径、大小和修改时间的摘要，模板变化后 ETag 随之变化。
+
+页面包含用户信息，响应使用 Cache-Control: private, no-cache（只允许浏览器缓存，每次使用前重新验证）。
+有待显示的闪现消息时不返回 304，以免消息被跳过。
+"""
+
+import hashlib
+import os
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+from utils.cache_versions import announcements_version, views_version
+from utils.menu_cache import menu_cache, get_access_class
+
+
+def _user_key(user):
+    if not user or not user.is_authenticated:
+        return 'anonymous'
+    # 侧边栏和导航栏显示的用户信息
+    return f"{user.get_id()}:{user.username}:{getattr(user, 'email', '')}:{get_access_class(user)}"
+
+
+def _templates_digest(app):
+    digest = hashlib.sha1()
+    folder = os.path.join(app.root_path, app.template_folder or 'templates')
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f"{os.path.relpath(os.path.join(root, name), folder)}:{stat.st_size}:{stat.st_mtime_ns};"
+                          .encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def build_id(app):
+    """部署标识：BUILD_ID 配置，未配置时第一次调用计算模板摘要并保存到配置中"""
+    if not app.config.get('BUILD_ID'):
+        app.config['BUILD_ID'] = _templates_digest(app)
+    return app.config['BUILD_ID']
+
+
+def page_validator(mongo):
+    """返回当前请求页面的 (ETag, Last-Modified)"""
+    version, updated_at = announcements_version.current(mongo)
+    key = repr((
+        version,
+        views_version.current(mongo)[0],
+        menu_cache.shared_version(mongo),
+        _user_key(current_user),
+        build_id(current_app),
+        request.full_path
+    ))
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    last_modified = None
+    if updated_at is not None:
+        last_modified = updated_at.replace(microsecond=0, tzinfo=timezone.utc)
+    return etag, last_modified
+
+
+def is_not_modified(etag, last_modified=None):
+    """按 If-None-Match（优先）或 If-Modified-Since 判断客户端缓存是否仍然有效"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_page(on_not_modified=None):
+    """为 GET 页面加上条件请求支持
+    on_not_modified(**view_args)：返回 304 时仍需执行的操作（如记录查看次数）
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            etag, last_modified = page_validator(current_app.mongo)
+
+            if is_not_modified(etag, last_modified):
+                if on_not_modified is not None:
+                    on_not_modified(**kwargs)
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                # 重定向、错误页等不加校验值
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,339 @@
+"""
+索引注册表
+所有集合的索引都在 INDEXES 中声明（按实际运行的查询设计），由 sync_indexes 同步到数据库：
+- 缺少的索引创建；同名但键或选项不同的索引删除后重建；键相同但名称不同的旧索引改为注册表中的名称
+- 同步可重复执行，已一致的索引不做任何操作
+- drop_unknown=True 时删除注册表中没有声明的索引
+- repair=False 时只创建缺少的索引，需要重建或改名的索引只报告（'drifted' / 'conflict'），不删除任何索引
+
+应用启动时每个 worker 都会同步，为避免多个进程同时删除、重建生产集合的索引，启动时只使用 repair=False；
+重建、改名和删除只由 python database_upgrade.py indexes 执行。
+
+QUERY_SHAPES 列出生产代码中的查询形状，verify_query_shapes 对每个形状执行 explain，
+获胜计划中出现 COLLSCAN（全表扫描）或 SORT（内存排序）时视为未命中索引。
+命令行：python database_upgrade.py indexes（只同步索引） / python database_upgrade.py verify（检查查询形状）
+"""
+
+import logging
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+from bson.son import SON
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from models.user import USER_COLLATION
+from utils.pagination import ANNOUNCEMENT_SORT, CREATED_SORT, _keyset_condition
+from utils.search_index import TERMS_COLLECTION
+from utils import user_search
+
+logger = logging.getLogger(__name__)
+
+# 注册表中比较的索引选项
+INDEX_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression', 'collation')
+
+# explain 获胜计划中不允许出现的阶段
+BAD_STAGES = ('COLLSCAN', 'SORT')
+
+
+class IndexSpec:
+    """一个索引的声明"""
+
+    def __init__(self, name, keys, **options):
+        self.name = name
+        self.keys = list(keys)
+        self.options = options
+
+    def model(self):
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+    def _option_document(self, option):
+        value = self.options.get(option)
+        if option == 'collation' and value is not None:
+            return value.document
+        return value
+
+    def matches(self, info):
+        """与 index_information() 中的一项比较键和选项"""
+        if _normalize_keys(info['key']) != self.keys:
+            return False
+
+        for option in INDEX_OPTIONS:
+            expected = self._option_document(option)
+            actual = info.get(option)
+            if option in ('unique', 'sparse'):
+                if bool(expected) != bool(actual):
+                    return False
+            elif option == 'collation':
+                # 服务器会补全 collation 的默认字段，只比较声明的部分
+                if expected is None:
+                    if actual is not None:
+                        return False
+                elif actual is None or any(actual.get(k) != v for k, v in expected.items()):
+                    return False
+            elif expected != actual:
+                return False
+        return True
+
+
+def _normalize_keys(keys):
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction)
+            for field, direction in keys]
+
+
+INDEXES = {
+    'announcements': [
+        # 列表页：status 过滤 + 置顶、发布时间、_id 排序（游标分页）
+        IndexSpec('status_keyset_idx', [('status', 1), ('is_pinned', -1), ('publish_time', -1), ('_id', -1)]),
+        # 管理后台"全部"公告：不过滤状态
+        IndexSpec('keyset_idx', [('is_pinned', -1), ('publish_time', -1), ('_id', -1)]),
+        # 首页最近公告（读模型不完整时的回退查询）
+        IndexSpec('status_publish_idx', [('status', 1), ('publish_time', -1)]),
+        # 管理后台仪表盘：按创建时间倒序
+        IndexSpec('ann_created_keyset_idx', [('created_at', -1), ('_id', -1)]),
+        # 按状态导出：status 过滤 + 创建时间倒序
+        IndexSpec('status_created_idx', [('status', 1), ('created_at', -1), ('_id', -1)]),
+        IndexSpec('category_idx', [('category', 1)]),
+        IndexSpec('author_idx', [('author_id', 1)]),
+    ],
+    TERMS_COLLECTION: [
+        IndexSpec('term_status_idx', [('term', 1), ('status', 1)]),
+        IndexSpec('announcement_id_idx', [('announcement_id', 1)]),
+    ],
+    'users': [
+        # 登录按用户名或邮箱查找，不区分大小写且唯一（查询需使用相同的 USER_COLLATION）
+        IndexSpec('username_ci_unique', [('username', 1)], unique=True, collation=USER_COLLATION),
+        IndexSpec('email_ci_unique', [('email', 1)], unique=True, collation=USER_COLLATION),
+        # 管理后台用户列表按创建时间倒序
+        IndexSpec('created_at_idx', [('created_at', -1)]),
+        # 管理后台用户列表的筛选（已验证/未验证、管理员、激活/停用）+ 创建时间倒序
+        IndexSpec('verified_created_idx', [('email_verified', 1), ('created_at', -1)]),
+        IndexSpec('admin_created_idx', [('is_admin', 1), ('created_at', -1)]),
+        IndexSpec('active_created_idx', [('is_active', 1), ('created_at', -1)]),
+        # 清理超过7天未验证邮箱的普通用户
+        IndexSpec('unverified_cleanup_idx', [('email_verified', 1), ('is_admin', 1), ('created_at', 1)]),
+        # 管理后台用户搜索：小写搜索键的前缀查询、三元组子串查询（见 utils/user_search.py）
+        IndexSpec('username_lower_idx', [('username_lower', 1)]),
+        IndexSpec('email_lower_idx', [('email_lower', 1)]),
+        IndexSpec('search_grams_idx', [('search_grams', 1)]),
+    ],
+    'dynamic_functions': [
+        IndexSpec('name_unique', [('name', 1)], unique=True),
+        IndexSpec('menu_level_idx', [('menu_level', 1)]),
+        IndexSpec('is_active_idx', [('is_active', 1)]),
+        IndexSpec('show_in_menu_idx', [('show_in_menu', 1)]),
+        IndexSpec('menu_order_idx', [('menu_order', 1)]),
+        # 菜单：激活且显示在菜单中的功能按 menu_order 排序
+        IndexSpec('menu_visible_idx', [('is_active', 1), ('show_in_menu', 1), ('menu_order', 1)]),
+        IndexSpec('created_at_idx', [('created_at', -1)]),
+    ],
+    'function_access_logs': [
+        IndexSpec('function_id_idx', [('function_id', 1)]),
+        IndexSpec('user_id_idx', [('user_id', 1)]),
+        IndexSpec('access_time_idx', [('access_time', -1)]),
+    ],
+    'sessions': [
+        # TTL索引：到达 expires_at 后由MongoDB自动删除
+        IndexSpec('session_ttl_idx', [('expires_at', 1)], expireAfterSeconds=0),
+    ],
+}
+
+
+def ensure_collection_indexes(collection, name=None):
+    """创建注册表中某个集合缺少的索引（不检查已有索引的选项，供运行时懒加载使用）"""
+    specs = INDEXES[name or collection.name]
+    collection.create_indexes([spec.model() for spec in specs])
+
+
+def sync_collection(collection, specs, drop_unknown=False, repair=True):
+    """把一个集合的索引同步为 specs，返回 [(索引名, 操作)]"""
+    report = []
+    existing = collection.index_information()
+    declared = {spec.name for spec in specs}
+
+    for spec in specs:
+        info = existing.get(spec.name)
+        if info is not None and spec.matches(info):
+            report.append((spec.name, 'ok'))
+            continue
+
+        # 键相同但名称不同的旧索引（如未命名创建的）会导致创建失败
+        conflicts = [other_name for other_name, other in existing.items()
+                     if other_name not in declared and other_name != '_id_' and
+                     _normalize_keys(other['key']) == spec.keys]
+
+        if not repair and (info is not None or conflicts):
+            action = 'drifted' if info is not None else 'conflict'
+            logger.warning(f"索引 {collection.name}.{spec.name} 与注册表不一致（{action}），"
+                           f"请运行 python database_upgrade.py indexes")
+            report.append((spec.name, action))
+            continue
+
+        try:
+            action = 'created'
+            if info is not None:
+                collection.drop_index(spec.name)
+                action = 'rebuilt'
+            for other_name in conflicts:
+                collection.drop_index(other_name)
+                existing.pop(other_name)
+                action = 'renamed'
+            collection.create_indexes([spec.model()])
+            report.append((spec.name, action))
+        except OperationFailure as e:
+            # 如已有重复数据时无法创建唯一索引，需要先人工处理
+            logger.warning(f"同步索引 {collection.name}.{spec.name} 失败: {e}")
+            report.append((spec.name, 'failed'))
+
+    if drop_unknown:
+        for other_name in existing:
+            if other_name not in declared and other_name != '_id_':
+                try:
+                    collection.drop_index(other_name)
+                    report.append((other_name, 'dropped'))
+                except OperationFailure as e:
+                    logger.warning(f"删除索引 {collection.name}.{other_name} 失败: {e}")
+                    report.append((other_name, 'failed'))
+    return report
+
+
+def sync_indexes(db, drop_unknown=False, collections=None, repair=True):
+    """同步注册表中的全部（或指定）集合，返回 {集合名: [(索引名, 操作)]}"""
+    result = {}
+    for name in collections or INDEXES:
+        result[name] = sync_collection(db[name], INDEXES[name], drop_unknown=drop_unknown, repair=repair)
+    return result
+
+
+def sync_on_startup(app):
+    """按 SYNC_INDEXES_ON_STARTUP 配置在后台线程中创建缺少的索引（不阻塞启动，不删除或重建索引，数据库不可用时只记录警告）"""
+    if not app.config.get('SYNC_INDEXES_ON_STARTUP', True):
+        return None
+
+    def run():
+        try:
+            report = sync_indexes(app.mongo.db, repair=False)
+        except PyMongoError as e:
+            logger.warning(f"启动时同步索引失败: {e}")
+            return
+        changed = [f"{collection}.{name}({action})"
+                   for collection, items in report.items()
+                   for name, action in items if action == 'created']
+        if changed:
+            logger.info(f"📊 已创建索引: {', '.join(changed)}")
+
+    thread = threading.Thread(target=run, name='index-sync', daemon=True)
+    thread.start()
+    return thread
+
+
+class QueryShape:
+    """一种生产查询的形状（过滤条件、排序、collation），用于 explain 检查"""
+
+    def __init__(self, collection, description, filter, sort=None, limit=None, collation=None):
+        self.collection = collection
+        self.description = description
+        self.filter = filter
+        self.sort = sort
+        self.limit = limit
+        self.collation = collation
+
+    def explain_command(self):
+        find = SON([('find', self.collection), ('filter', self.filter)])
+        if self.sort:
+            find['sort'] = SON(list(self.sort))
+        if self.limit:
+            find['limit'] = self.limit
+        if self.collation is not None:
+            find['collation'] = self.collation.document
+        return SON([('explain', find), ('verbosity', 'queryPlanner')])
+
+
+def _sample_cursor_values(sort):
+    """翻页条件中的排序值只影响常量，不影响计划，这里用占位值"""
+    samples = {'is_pinned': True, 'publish_time': SAMPLE_TIME, '_id': ObjectId(), 'created_at': SAMPLE_TIME}
+    return [samples.get(field) for field, _ in sort]
+
+
+SAMPLE_TIME = datetime(2024, 1, 1)
+
+
+def _next_page(query, sort):
+    condition = _keyset_condition(list(sort), _sample_cursor_values(sort), True)
+    return {'$and': [query, condition]} if query else condition
+
+
+QUERY_SHAPES = [
+    # routes/announcements.py、utils/announcement_cache.py
+    QueryShape('announcements', '公告列表第一页', {'status': 'published'}, ANNOUNCEMENT_SORT, 11),
+    QueryShape('announcements', '公告列表下一页', _next_page({'status': 'published'}, ANNOUNCEMENT_SORT),
+               ANNOUNCEMENT_SORT, 11),
+    QueryShape('announcements', '管理后台全部公告', {}, ANNOUNCEMENT_SORT, 21),
+    QueryShape('announcements', '管理后台全部公告下一页', _next_page({}, ANNOUNCEMENT_SORT), ANNOUNCEMENT_SORT, 21),
+    QueryShape('announcements', '管理后台草稿公告', {'status': 'draft'}, ANNOUNCEMENT_SORT, 21),
+    QueryShape('announcements', '管理后台按分类', {'category': '通知'}),
+    QueryShape('announcements', '仪表盘最近创建', {}, CREATED_SORT, 11),
+    QueryShape('announcements', '按状态导出', {'status': 'published'}, CREATED_SORT),
+    # routes/main.py
+    QueryShape('announcements', '首页最近公告', {'status': 'published'}, [('publish_time', -1)], 5),
+    # utils/search_index.py
+    QueryShape(TERMS_COLLECTION, '搜索倒排记录',
+               {'status': 'published', '$or': [{'term': {'$in': ['公告', '告通']}}, {'term': {'$regex': '^维'}}]}),
+    QueryShape(TERMS_COLLECTION, '重建单条公告的倒排记录', {'announcement_id': {'$in': [ObjectId()]}}),
+    # models/user.py
+    QueryShape('users', '按用户名登录', {'username': 'admin'}, collation=USER_COLLATION),
+    QueryShape('users', '按邮箱登录', {'email': 'admin@example.com'}, collation=USER_COLLATION),
+    QueryShape('users', '按用户名或邮箱登录',
+               {'$or': [{'username': 'admin'}, {'email': 'admin@example.com'}]}, limit=2, collation=USER_COLLATION),
+    # routes/admin.py
+    QueryShape('users', '用户列表', {}, [('created_at', -1)], 20),
+    QueryShape('users', '用户列表（已验证）', {'email_verified': True}, [('created_at', -1)], 20),
+    QueryShape('users', '用户列表（管理员）', {'is_admin': True}, [('created_at', -1)], 20),
+    QueryShape('users', '用户列表（停用）', {'is_active': False}, [('created_at', -1)], 20),
+    QueryShape('users', '清理未验证用户', {'email_verified': False, 'is_admin': False, 'created_at': {'$lt': SAMPLE_TIME}}),
+    # utils/user_search.py
+    QueryShape('users', '用户搜索（前缀）', user_search.build_query('ad'), limit=user_search.MAX_RESULTS),
+    QueryShape('users', '用户搜索（前缀和子串）', user_search.build_query('admin'), limit=user_search.MAX_RESULTS),
+    QueryShape('users', '用户搜索（邮箱）', user_search.build_query('admin@example'), limit=user_search.MAX_RESULTS),
+    QueryShape('users', '用户搜索（完全匹配）', {'$or': [{'username_lower': 'admin'}, {'email_lower': 'admin'}]}),
+    # utils/menu_cache.py、routes/dynamic.py
+    QueryShape('dynamic_functions', '菜单', {'is_active': True, 'show_in_menu': True}, [('menu_order', 1)]),
+    QueryShape('dynamic_functions', '功能列表', {}, [('menu_order', 1)]),
+    QueryShape('dynamic_functions', '一级菜单', {'menu_level': 1}),
+    QueryShape('dynamic_functions', '按名称查找功能', {'name': 'home'}),
+    # utils/session_store.py
+    QueryShape('sessions', '过期会话（TTL）', {'expires_at': {'$lt': SAMPLE_TIME}}),
+]
+
+
+def _plan_stages(plan):
+    """遍历计划树，返回全部阶段名（兼容经典计划和 SBE 的 queryPlan 结构）"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def explain_stages(db, shape):
+    """返回查询形状获胜计划中的阶段名"""
+    result = db.command(shape.explain_command())
+    return _plan_stages(result['queryPlanner']['winningPlan'])
+
+
+def verify_query_shapes(db, shapes=None):
+    """对每个查询形状执行 explain，返回 [(形状, 不允许的阶段列表)]，列表为空表示命中索引
+
+    集合不存在时 explain 只返回 EOF，应在同步索引后、有代表性数据的库上运行。
+    """
+    results = []
+    for shape in shapes or QUERY_SHAPES:
+        stages = explain_stages(db, shape)
+        results.append((shape, [stage for stage in stages if stage in BAD_STAGES]))
+    return results
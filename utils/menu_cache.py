@@ -0,0 +1,313 @@
+"""
+动态菜单缓存
+菜单数据在进程内只构建一次，动态功能发生变更（增删改、启停）时递增版本号，
+下一次渲染时才重新查询MongoDB。
+
+权限过滤的结果只取决于用户所属的访问级别（匿名、登录、已验证、管理员），
+因此每次重建时为每个访问级别预先生成一份只读的菜单快照，
+请求时按用户属性直接取出对应快照。
+
+多进程/多主机部署时，写操作同时递增 cache_versions 中的 'menu' 版本文档，
+各进程最多每 MENU_VERSION_CHECK_INTERVAL 秒检查一次该文档；
+若开启 MENU_CHANGE_STREAM 且MongoDB为副本集，还会用变更流即时失效本地缓存；
+变更流因网络错误、主节点切换等中断时按退避间隔从最后的 resume token 继续监听，期间仍按间隔检查版本号。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.cache_versions import get_version, bump_version as bump_shared_version
+
+logger = logging.getLogger(__name__)
+
+MENU_VERSION_KEY = 'menu'
+
+# 变更流中断后的重试间隔（秒），每次失败翻倍
+WATCH_RETRY_MIN = 1
+WATCH_RETRY_MAX = 60
+
+# 单机MongoDB不支持变更流（"$changeStream stage is only supported on replica sets"）
+CHANGE_STREAM_UNSUPPORTED = 40573
+# resume token 已不在 oplog 中，无法从中断处继续
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+# 访问级别代表用户：只包含权限判断需要的属性
+AccessProfile = namedtuple('AccessProfile', ['is_authenticated', 'email_verified', 'is_admin'])
+
+ACCESS_CLASSES = {
+    'anonymous': AccessProfile(False, False, False),
+    'authenticated': AccessProfile(True, False, False),
+    'verified': AccessProfile(True, True, False),
+    'admin_unverified': AccessProfile(True, False, True),
+    'admin': AccessProfile(True, True, True),
+}
+
+EMPTY_MENU = MappingProxyType({
+    'primary': (),
+    'secondary': MappingProxyType({}),
+    'dynamic_functions': (),
+    'primary_menu': (),
+    'menu_groups': ()
+})
+
+
+def check_function_access(function_config, user):
+    """检查用户是否有权限访问功能"""
+    if not function_config.get('is_active', True):
+        return False
+
+    access_level = function_config.get('access_level', 'verified')
+
+    # 公开访问
+    if access_level == 'public' or function_config.get('is_public', False):
+        return True
+
+    # 需要登录
+    if not user or not user.is_authenticated:
+        return False
+
+    # 所有登录用户（'all' 为旧版中间件使用的写法）
+    if access_level in ('all_users', 'all'):
+        return True
+
+    # 需要验证邮箱
+    if access_level == 'verified':
+        return hasattr(user, 'email_verified') and user.email_verified
+
+    # 仅管理员
+    if access_level == 'admin':
+        return hasattr(user, 'is_admin') and user.is_admin
+
+    # 自定义角色/权限（后续扩展）
+    if access_level == 'custom':
+        required_roles = function_config.get('required_roles', [])
+        required_perms = function_config.get('required_perms', [])
+
+        if not required_roles and not required_perms:
+            return True
+
+        # 这里可以扩展角色和权限检查逻辑
+        return True
+
+    return False
+
+
+def get_access_class(user):
+    """根据用户属性确定访问级别"""
+    if not user or not getattr(user, 'is_authenticated', False):
+        return 'anonymous'
+
+    verified = bool(getattr(user, 'email_verified', False))
+    if getattr(user, 'is_admin', False):
+        return 'admin' if verified else 'admin_unverified'
+    return 'verified' if verified else 'authenticated'
+
+
+def build_menu_tree(functions, user):
+    """
+    构建菜单树（单次遍历，按ID建立索引，复杂度 O(n)）
+    同时返回两种结构：
+    - primary / secondary：一级菜单列表 + 按父级ID分组的二级菜单
+    - dynamic_functions / primary_menu / menu_groups：带 children 的一级菜单及菜单组
+    """
+    primary = []
+    secondary = {}
+    accessible = []
+
+    for func in functions:
+        if func['menu_level'] == 1:  # 一级菜单
+            if check_function_access(func, user):
+                primary.append(func)
+                accessible.append(func)
+        elif func['menu_level'] == 2:  # 二级菜单
+            parent_id = func.get('parent_id')
+            if parent_id:
+                # parent_id 可能是 ObjectId，统一转为字符串与 _id 匹配
+                children = secondary.setdefault(str(parent_id), [])
+                if check_function_access(func, user):
+                    children.append(func)
+                    accessible.append(func)
+
+    primary_menu = []
+    menu_groups = []
+    for func in primary:
+        children = tuple(secondary.get(func['_id'], ()))
+        primary_menu.append(MappingProxyType(dict(func, children=children, has_children=bool(children))))
+        if children:
+            menu_groups.append(MappingProxyType({
+                'id': func['_id'],
+                'title': func['title'],
+                'icon': func.get('icon', ''),
+                'items': children
+            }))
+
+    return MappingProxyType({
+        'primary': tuple(primary),
+        'secondary': MappingProxyType({key: tuple(items) for key, items in secondary.items()}),
+        'dynamic_functions': tuple(accessible),
+        'primary_menu': tuple(primary_menu),
+        'menu_groups': tuple(menu_groups)
+    })
+
+
+def _freeze_function(func):
+    """转换ID并冻结单个功能配置，快照之间共享同一份只读对象"""
+    func['_id'] = str(func['_id'])
+    return MappingProxyType(func)
+
+
+class MenuCache:
+    """带版本号的进程内菜单缓存"""
+
+    def __init__(self, check_interval=5):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._built_version = -1
+        self._functions = ()
+        self._snapshots = {}
+
+        # 共享版本号检查
+        self.check_interval = check_interval
+        self._shared_version = None
+        self._next_check = 0.0
+
+        # 变更流监听
+        self.use_change_stream = False
+        self._watcher_pid = None
+
+    def init_app(self, app):
+        """从应用配置读取检查间隔和变更流开关"""
+        self.check_interval = app.config.get('MENU_VERSION_CHECK_INTERVAL', self.check_interval)
+        self.use_change_stream = app.config.get('MENU_CHANGE_STREAM', False)
+
+    @property
+    def version(self):
+        return self._version
+
+    def invalidate(self):
+        """只使本进程的缓存失效"""
+        with self._lock:
+            self._version += 1
+            return self._version
+
+    def bump_version(self, mongo=None):
+        """动态功能变更后调用，使本进程及其他进程的缓存失效"""
+        version = self.invalidate()
+        if mongo is not None:
+            try:
+                # 记下自己写入的版本号，避免本进程下次检查时重复重建
+                self._shared_version = bump_shared_version(mongo, MENU_VERSION_KEY)
+            except PyMongoError as e:
+                logger.error(f"更新菜单共享版本号失败: {e}")
+        return version
+
+    def _check_shared_version(self, mongo):
+        """按间隔检查共享版本号，其他进程有变更时使本地缓存失效"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+
+        try:
+            shared_version = get_version(mongo, MENU_VERSION_KEY)
+        except PyMongoError as e:
+            logger.warning(f"读取菜单共享版本号失败: {e}")
+            return
+
+        if shared_version != self._shared_version:
+            self._shared_version = shared_version
+            self.invalidate()
+
+    def shared_version(self, mongo):
+        """共享版本号（按间隔检查），用于生成页面校验值"""
+        self._check_shared_version(mongo)
+        return self._shared_version
+
+    def _ensure_watcher(self, mongo):
+        """在当前进程中启动变更流监听线程（fork出的worker会各自启动）"""
+        pid = os.getpid()
+        if not self.use_change_stream or self._watcher_pid == pid:
+            return
+
+        with self._lock:
+            if self._watcher_pid == pid:
+                return
+            self._watcher_pid = pid
+
+        thread = threading.Thread(target=self._watch_changes, args=(mongo,),
+                                  name='menu-change-stream', daemon=True)
+        thread.start()
+
+    def _watch_changes(self, mongo):
+        resume_token = None
+        delay = WATCH_RETRY_MIN
+        while True:
+            try:
+                with mongo.db.dynamic_functions.watch(resume_after=resume_token) as stream:
+                    logger.info("菜单变更流监听已启动")
+                    delay = WATCH_RETRY_MIN
+                    resume_token = stream.resume_token
+                    for _ in stream:
+                        resume_token = stream.resume_token
+                        self.invalidate()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    # 单机MongoDB不支持变更流，只使用版本号轮询
+                    logger.warning(f"菜单变更流不可用，使用版本号轮询: {e}")
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # 无法从中断处继续，中断期间的变更可能遗漏，重建一次
+                    resume_token = None
+                    self.invalidate()
+                logger.warning(f"菜单变更流中断，{delay} 秒后重试: {e}")
+            except PyMongoError as e:
+                logger.warning(f"菜单变更流中断，{delay} 秒后重试: {e}")
+
+            time.sleep(delay)
+            delay = min(delay * 2, WATCH_RETRY_MAX)
+
+    def _ensure_built(self, mongo):
+        self._ensure_watcher(mongo)
+        self._check_shared_version(mongo)
+
+        if self._built_version == self._version:
+            return
+
+        with self._lock:
+            if self._built_version == self._version:
+                return
+
+            # 先记录版本号，构建期间若有新的变更，下次访问会再次重建
+            version = self._version
+            functions = tuple(_freeze_function(func) for func in mongo.db.dynamic_functions.find({
+                'is_active': True,
+                'show_in_menu': True
+            }).sort('menu_order', 1))
+
+            self._snapshots = {
+                name: build_menu_tree(functions, profile)
+                for name, profile in ACCESS_CLASSES.items()
+            }
+            self._functions = functions
+            self._built_version = version
+
+    def get_functions(self, mongo):
+        """获取激活且显示在菜单中的功能列表（按 menu_order 排序）"""
+        self._ensure_built(mongo)
+        return self._functions
+
+    def get_menu(self, mongo, user):
+        """获取用户所属访问级别的菜单快照"""
+        self._ensure_built(mongo)
+        return self._snapshots.get(get_access_class(user), EMPTY_MENU)
+
+
+# 全局菜单缓存实例
+menu_cache = MenuCache()
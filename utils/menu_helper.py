@@ -12,13 +12,20 @@ def get_admin_menu():
 
 
 def filter_menu_by_permission(menu_items):
-    """根据权限过滤菜单"""
+    """根据权限过滤菜单
+
+    get_admin_menu 等函数返回的菜单在启动时已按权限级别编译为只读结构，直接返回即可；
+    其他来源的菜单会复制后再处理，不修改传入的数据。
+    """
     if not menu_items:
-        return []
+        return ()
+
+    if isinstance(menu_items, tuple):
+        return menu_items
 
     filtered = []
     for item in menu_items:
-        filtered.append(item)
         if 'children' in item:
-            item['children'] = filter_menu_by_permission(item['children'])
-    return filtered
\ No newline at end of file
+            item = dict(item, children=filter_menu_by_permission(item['children']))
+        filtered.append(item)
+    return filtered
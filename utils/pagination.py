@@ -0,0 +1,185 @@
+"""
+游标（keyset）分页与缓存的总数
+- keyset_paginate：按排序字段的值定位下一页/上一页，不使用 skip，
+  任意页的查询代价都只与每页条数有关；翻页令牌是对排序值和页码编码后的不透明字符串
+- CountCache：缓存各查询条件的总数，共享版本号（见 utils/cache_versions.SharedVersion）变化时失效；
+  另有 ttl 兜底，覆盖脚本等未递增版本号的写入
+"""
+
+import base64
+import binascii
+import json
+import threading
+import time
+
+from bson import json_util
+
+from utils.cache_versions import announcements_version
+
+# 公告列表的排序：置顶优先、发布时间倒序，_id 保证顺序唯一
+ANNOUNCEMENT_SORT = (('is_pinned', -1), ('publish_time', -1), ('_id', -1))
+
+# 管理后台按创建时间倒序
+CREATED_SORT = (('created_at', -1), ('_id', -1))
+
+
+class KeysetPage:
+    """一页查询结果"""
+
+    def __init__(self, items, page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.page = page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(direction, values, page):
+    """把翻页方向、排序值和目标页码编码为URL安全的令牌"""
+    payload = json_util.dumps({'d': direction, 'v': values, 'p': page}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """解析翻页令牌，无效时返回 None"""
+    if not token:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json_util.loads(payload.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+
+    if (not isinstance(data, dict) or data.get('d') not in ('next', 'prev') or
+            not isinstance(data.get('v'), list) or not isinstance(data.get('p'), int)):
+        return None
+    return data
+
+
+def _compare(field, operator, value):
+    """排序意义上的大于/小于（null 和缺失字段在 MongoDB 排序中最小）"""
+    if value is None:
+        if operator == '$gt':
+            return {field: {'$ne': None}}
+        return None  # 没有比 null 更小的值
+    if operator == '$lt':
+        return {'$or': [{field: {'$lt': value}}, {field: None}]}
+    return {field: {'$gt': value}}
+
+
+def _keyset_condition(sort, values, forward):
+    """排在 values 之后（forward）或之前的文档的查询条件"""
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        ascending = (direction == 1) == forward
+        comparison = _compare(field, '$gt' if ascending else '$lt', values[i])
+        if comparison is None:
+            continue
+        equalities = [{sort[j][0]: values[j]} for j in range(i)]
+        branches.append({'$and': equalities + [comparison]} if equalities else comparison)
+
+    if not branches:
+        return None
+    return branches[0] if len(branches) == 1 else {'$or': branches}
+
+
+def keyset_paginate(collection, query, sort, per_page, cursor=None, projection=None):
+    """按 sort 顺序返回 cursor 指向的一页（cursor 为空时返回第一页）"""
+    sort = list(sort)
+    state = decode_cursor(cursor)
+    if state is not None and len(state['v']) != len(sort):
+        state = None
+
+    forward = state is None or state['d'] == 'next'
+    page = state['p'] if state else 1
+
+    condition = None
+    if state is not None:
+        condition = _keyset_condition(sort, state['v'], forward)
+        if condition is None:
+            return KeysetPage([], page)
+
+    filters = dict(query)
+    if condition is not None:
+        filters = {'$and': [query, condition]} if query else condition
+
+    fetch_sort = sort if forward else [(field, -direction) for field, direction in sort]
+    items = list(collection.find(filters, projection).sort(fetch_sort).limit(per_page + 1))
+
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if not forward:
+        items.reverse()
+
+    if not items:
+        return KeysetPage([], page)
+
+    def values_of(doc):
+        return [doc.get(field) for field, _ in sort]
+
+    # 向后翻页时多取的一条说明还有下一页；向前翻页时同理判断是否还有上一页
+    has_next = has_more if forward else True
+    has_prev = (state is not None if forward else has_more) and page > 1
+
+    next_cursor = encode_cursor('next', values_of(items[-1]), page + 1) if has_next else None
+    prev_cursor = encode_cursor('prev', values_of(items[0]), page - 1) if has_prev else None
+
+    return KeysetPage(items, page, next_cursor, prev_cursor)
+
+
+class CountCache:
+    """按查询条件缓存 count_documents（及汇总统计）的结果"""
+
+    def __init__(self, shared_version, ttl=300, max_entries=256):
+        self.shared_version = shared_version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._version = None
+
+    def init_app(self, app):
+        self.ttl = app.config.get('COUNT_CACHE_TTL', self.ttl)
+
+    def invalidate(self):
+        """只清空本进程的缓存"""
+        with self._lock:
+            self._counts.clear()
+
+    def cached(self, mongo, key, compute):
+        """返回 compute() 的缓存结果；共享版本号变化或超过 ttl 时重新计算"""
+        version = self.shared_version.current(mongo)[0]
+        now = time.monotonic()
+
+        with self._lock:
+            if version != self._version:
+                self._counts.clear()
+                self._version = version
+
+            entry = self._counts.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+
+        value = compute()
+
+        with self._lock:
+            if len(self._counts) >= self.max_entries:
+                self._counts.clear()
+            self._counts[key] = (value, now + self.ttl)
+        return value
+
+    def count(self, mongo, collection_name, query):
+        """返回 query 的文档总数，优先使用缓存"""
+        key = (collection_name, json.dumps(query, sort_keys=True, default=str))
+        return self.cached(mongo, key, lambda: mongo.db[collection_name].count_documents(query))
+
+
+# 公告总数缓存
+announcement_counts = CountCache(announcements_version)
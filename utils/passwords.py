@@ -0,0 +1,235 @@
+"""
+密码哈希算法
+支持三种存储格式，按哈希字符串前缀识别：
+- pbkdf2：werkzeug 格式 pbkdf2:sha256:<迭代次数>$salt$hash
+- scrypt：werkzeug 格式 scrypt:<n>:<r>:<p>$salt$hash（werkzeug 3.x 默认）。每次计算约占用 128·n·r 字节内存，
+  n 受 PASSWORD_SCRYPT_MAXMEM 限制（哈希线程池的每个线程都会同时占用这么多内存），计算时也把该上限传给 hashlib.scrypt
+- bcrypt：bcrypt-sha256$$2b$<cost>$...（需要安装 bcrypt）。bcrypt 只接受72字节以内的密码（超出时 bcrypt 5.x 抛出 ValueError），
+  因此先计算密码的 SHA-256 并 base64 编码（44字节）再交给 bcrypt；不带前缀的 $2b$ 哈希为直接计算的旧格式，
+  仍可校验，登录成功时重新计算为新格式
+
+新密码使用 PASSWORD_HASHER / PASSWORD_HASH_COST 配置的算法和成本；
+登录成功时若已存储的哈希算法或成本与配置不同，会用明文密码重新计算（见 User.rehash_password_if_needed）。
+成本可以用 calibrate_cost 按目标校验耗时自动确定（manage.py 菜单"校准密码哈希成本"）。
+"""
+
+import base64
+import hashlib
+import time
+
+from werkzeug.security import gen_salt, generate_password_hash, check_password_hash
+
+try:
+    import bcrypt
+except ImportError:  # bcrypt 为可选依赖
+    bcrypt = None
+
+
+class PBKDF2Hasher:
+    """werkzeug PBKDF2-SHA256，成本为迭代次数"""
+    name = 'pbkdf2'
+    default_cost = 1000000
+    min_cost = 100000
+
+    def identify(self, password_hash):
+        return password_hash.startswith('pbkdf2:')
+
+    def hash(self, password, cost):
+        return generate_password_hash(password, method=f'pbkdf2:sha256:{cost}')
+
+    def verify(self, password_hash, password):
+        return check_password_hash(password_hash, password)
+
+    def get_cost(self, password_hash):
+        parts = password_hash.split('$', 1)[0].split(':')
+        return int(parts[2]) if len(parts) > 2 else None
+
+    def next_cost(self, cost):
+        return cost * 2
+
+    def outdated(self, password_hash):
+        return False
+
+    def cost_allowed(self, cost):
+        return True
+
+
+class ScryptHasher:
+    """werkzeug scrypt，成本为 n（2的幂），r=8、p=1"""
+    name = 'scrypt'
+    default_cost = 32768
+    min_cost = 16384
+    block_size = 8
+    salt_length = 16
+    # 与 werkzeug 相同按 132·n·r 估算（128 之外留出余量）
+    memory_factor = 132
+
+    def __init__(self, max_memory=64 * 1024 * 1024):
+        self.max_memory = max_memory
+
+    def identify(self, password_hash):
+        return password_hash.startswith('scrypt:')
+
+    def memory(self, cost):
+        """成本为 cost 时一次计算需要的内存（字节）"""
+        return self.memory_factor * cost * self.block_size
+
+    def cost_allowed(self, cost):
+        return self.memory(cost) <= self.max_memory
+
+    def hash(self, password, cost):
+        if not self.cost_allowed(cost):
+            raise ValueError(f"scrypt 成本 n={cost} 需要 {self.memory(cost) // (1024 * 1024)}MB 内存，"
+                             f"超过 PASSWORD_SCRYPT_MAXMEM")
+        # 生成与 werkzeug 相同的格式，由 check_password_hash 校验
+        salt = gen_salt(self.salt_length)
+        digest = hashlib.scrypt(password.encode('utf-8'), salt=salt.encode('utf-8'),
+                                n=cost, r=self.block_size, p=1, maxmem=self.max_memory).hex()
+        return f'scrypt:{cost}:{self.block_size}:1${salt}${digest}'
+
+    def verify(self, password_hash, password):
+        return check_password_hash(password_hash, password)
+
+    def get_cost(self, password_hash):
+        parts = password_hash.split('$', 1)[0].split(':')
+        return int(parts[1]) if len(parts) > 1 else None
+
+    def next_cost(self, cost):
+        return cost * 2
+
+    def outdated(self, password_hash):
+        return False
+
+
+class BcryptHasher:
+    """bcrypt，成本为 log2 轮数"""
+    name = 'bcrypt'
+    default_cost = 12
+    min_cost = 10
+    prefix = 'bcrypt-sha256$'
+    legacy_prefixes = ('$2a$', '$2b$', '$2y$')
+
+    def identify(self, password_hash):
+        return password_hash.startswith((self.prefix,) + self.legacy_prefixes)
+
+    def _require(self):
+        if bcrypt is None:
+            raise RuntimeError('使用 bcrypt 需要先安装: pip install bcrypt')
+
+    @staticmethod
+    def _prehash(password):
+        return base64.b64encode(hashlib.sha256(password.encode('utf-8')).digest())
+
+    def hash(self, password, cost):
+        self._require()
+        return self.prefix + bcrypt.hashpw(self._prehash(password), bcrypt.gensalt(rounds=cost)).decode('ascii')
+
+    def verify(self, password_hash, password):
+        self._require()
+        try:
+            if password_hash.startswith(self.prefix):
+                return bcrypt.checkpw(self._prehash(password), password_hash[len(self.prefix):].encode('ascii'))
+            # 旧格式：超过72字节的密码不可能生成过这种哈希
+            return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+        except ValueError:
+            return False
+
+    def get_cost(self, password_hash):
+        parts = password_hash.split('$')
+        if password_hash.startswith(self.prefix):
+            parts = parts[1:]
+        return int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else None
+
+    def next_cost(self, cost):
+        return cost + 1
+
+    def outdated(self, password_hash):
+        return not password_hash.startswith(self.prefix)
+
+    def cost_allowed(self, cost):
+        return True
+
+
+HASHERS = {hasher.name: hasher for hasher in (PBKDF2Hasher(), ScryptHasher(), BcryptHasher())}
+
+
+class PasswordHasher:
+    """按配置生成哈希，按哈希格式校验"""
+
+    def __init__(self, scheme='scrypt', cost=None):
+        self.scheme = scheme
+        self.cost = cost
+
+    def init_app(self, app):
+        self.scheme = app.config.get('PASSWORD_HASHER', self.scheme)
+        self.cost = app.config.get('PASSWORD_HASH_COST', self.cost)
+        HASHERS['scrypt'].max_memory = app.config.get('PASSWORD_SCRYPT_MAXMEM', HASHERS['scrypt'].max_memory)
+        if self.scheme not in HASHERS:
+            raise ValueError(f"未知的密码哈希算法: {self.scheme}")
+        if not self.hasher.cost_allowed(self.target_cost):
+            raise ValueError(f"PASSWORD_HASH_COST={self.target_cost} 超出 {self.scheme} 允许的内存上限")
+
+    @property
+    def hasher(self):
+        return HASHERS[self.scheme]
+
+    @property
+    def target_cost(self):
+        return self.cost or self.hasher.default_cost
+
+    def identify(self, password_hash):
+        """返回能处理该哈希的算法，无法识别时返回 None"""
+        if not password_hash:
+            return None
+        for hasher in HASHERS.values():
+            if hasher.identify(password_hash):
+                return hasher
+        return None
+
+    def hash_password(self, password):
+        return self.hasher.hash(password, self.target_cost)
+
+    def verify_password(self, password_hash, password):
+        hasher = self.identify(password_hash)
+        if hasher is None:
+            return False
+        return hasher.verify(password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """已存储的哈希算法、格式或成本与当前配置不同"""
+        hasher = self.identify(password_hash)
+        if hasher is None or hasher.name != self.scheme or hasher.outdated(password_hash):
+            return True
+        return hasher.get_cost(password_hash) != self.target_cost
+
+
+def calibrate_cost(scheme, target_ms=250, samples=3, max_steps=12):
+    """逐步提高成本，返回校验耗时首次达到 target_ms 的成本，以及各成本的实测耗时
+    成本不超过算法允许的上限（scrypt 受 PASSWORD_SCRYPT_MAXMEM 限制），到达上限时返回允许的最高成本。
+    """
+    hasher = HASHERS[scheme]
+    cost = hasher.min_cost
+    measurements = []
+
+    for _ in range(max_steps):
+        if measurements and not hasher.cost_allowed(cost):
+            break
+        password_hash = hasher.hash('calibration-password', cost)
+        best = None
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.verify(password_hash, 'calibration-password')
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        measurements.append((cost, best))
+
+        if best >= target_ms:
+            return cost, measurements
+        cost = hasher.next_cost(cost)
+
+    # 达到步数或内存上限仍未到目标耗时，返回测过的最高成本
+    return measurements[-1][0], measurements
+
+
+# 全局密码哈希配置
+password_hasher = PasswordHasher()
@@ -0,0 +1,242 @@
+"""
+公告全文搜索（N-gram 倒排索引）
+MongoDB 的 text 索引不能切分中文，这里自行维护倒排索引集合 announcement_terms，
+每条记录为 {term, announcement_id, status, weight}：
+- 中文连续片段切成二元组（bigram），片段最后一个字再单独作为一项，
+  这样任意单字都是某一项的前缀，单字查询用前缀匹配即可走索引
+- 英文和数字按单词（小写）作为一项
+- weight = 标题出现次数 * TITLE_WEIGHT + 正文出现次数
+
+查询时多字中文关键词切成二元组、单字按前缀匹配，要求每一项都命中（相邻二元组的组合
+近似三元及更长的短语匹配），按权重之和排序，再对候选结果中完整出现关键词的公告加分。
+
+索引在公告创建、编辑、删除、切换状态时增量更新；database_upgrade.py 可全量重建。
+"""
+
+import re
+
+from markupsafe import Markup, escape
+from pymongo import InsertOne
+
+TERMS_COLLECTION = 'announcement_terms'
+
+TITLE_WEIGHT = 3
+PHRASE_BONUS = 10  # 标题或正文中完整出现关键词时的加分
+SNIPPET_LENGTH = 120
+MAX_QUERY_LENGTH = 50
+
+# 中文（含扩展A区）连续片段，或英文数字单词
+TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9]+')
+
+
+def _is_cjk(run):
+    return '\u3400' <= run[0] <= '\u9fff'
+
+
+def tokenize(text):
+    """切分待索引的文本，返回项列表（可重复）"""
+    terms = []
+    for run in TOKEN_RE.findall((text or '').lower()):
+        if not _is_cjk(run):
+            terms.append(run)
+            continue
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        terms.append(run[-1])
+    return terms
+
+
+def build_postings(announcement):
+    """计算一条公告的倒排记录"""
+    weights = {}
+    for term in tokenize(announcement.get('title', '')):
+        weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+    for term in tokenize(announcement.get('plain_text', '')):
+        weights[term] = weights.get(term, 0) + 1
+
+    return [
+        {
+            'term': term,
+            'announcement_id': announcement['_id'],
+            'status': announcement.get('status', 'draft'),
+            'weight': weight
+        }
+        for term, weight in weights.items()
+    ]
+
+
+def ensure_indexes(db):
+    """按索引注册表（utils/indexes.py）创建倒排集合的索引"""
+    from utils.indexes import ensure_collection_indexes
+    ensure_collection_indexes(db[TERMS_COLLECTION])
+
+
+def index_announcement(db, announcement):
+    """重建一条公告的倒排记录（创建、编辑后调用，announcement 需包含 title、plain_text、status）"""
+    terms = db[TERMS_COLLECTION]
+    terms.delete_many({'announcement_id': announcement['_id']})
+    postings = build_postings(announcement)
+    if postings:
+        terms.insert_many(postings, ordered=False)
+
+
+def remove_announcement(db, announcement_id):
+    """删除公告后调用"""
+    remove_announcements(db, [announcement_id])
+
+
+def remove_announcements(db, announcement_ids):
+    """批量删除公告后调用"""
+    db[TERMS_COLLECTION].delete_many({'announcement_id': {'$in': list(announcement_ids)}})
+
+
+def update_status(db, announcement_id, status):
+    """公告发布/撤回后同步倒排记录中的状态"""
+    update_statuses(db, [announcement_id], status)
+
+
+def update_statuses(db, announcement_ids, status):
+    """批量发布/撤回后同步倒排记录中的状态"""
+    db[TERMS_COLLECTION].update_many({'announcement_id': {'$in': list(announcement_ids)}},
+                                     {'$set': {'status': status}})
+
+
+def rebuild_index(db, batch_size=1000):
+    """全量重建倒排索引，返回处理的公告数"""
+    terms = db[TERMS_COLLECTION]
+    terms.drop()
+    ensure_indexes(db)
+
+    count = 0
+    operations = []
+    cursor = db.announcements.find({}, {'title': 1, 'plain_text': 1, 'status': 1}).batch_size(batch_size)
+    for announcement in cursor:
+        operations.extend(InsertOne(posting) for posting in build_postings(announcement))
+        count += 1
+        if len(operations) >= batch_size * 10:
+            terms.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        terms.bulk_write(operations, ordered=False)
+    return count
+
+
+def query_terms(keyword):
+    """切分关键词，返回 [(项, 是否按前缀匹配)]
+
+    多字中文片段只取二元组（片段末字已被最后一个二元组覆盖），单字片段按前缀匹配。
+    """
+    terms = {}
+    for run in TOKEN_RE.findall((keyword or '').lower()):
+        if not _is_cjk(run):
+            terms.setdefault(run, False)
+        elif len(run) == 1:
+            terms.setdefault(run, True)
+        else:
+            for i in range(len(run) - 1):
+                terms.setdefault(run[i:i + 2], False)
+    return list(terms.items())
+
+
+def search(db, keyword, limit=20, candidates=200, status='published'):
+    """返回 [(公告ID, 得分)]，按得分从高到低排列"""
+    keyword = (keyword or '').strip()[:MAX_QUERY_LENGTH]
+    terms = query_terms(keyword)
+    if not terms:
+        return []
+
+    exact_terms = [term for term, prefix in terms if not prefix]
+    prefix_chars = [term for term, prefix in terms if prefix]
+
+    term_filter = [{'term': {'$in': exact_terms}}] if exact_terms else []
+    term_filter += [{'term': {'$regex': '^' + re.escape(char)}} for char in prefix_chars]
+
+    # 同一公告的每个项只有一条记录，命中的精确项条数即命中的精确项个数；
+    # 单字项按首字判断是否至少命中一条
+    group = {
+        '_id': '$announcement_id',
+        'score': {'$sum': '$weight'},
+        'exact_hits': {'$sum': {'$cond': [{'$in': ['$term', exact_terms]}, 1, 0]}}
+    }
+    for i, char in enumerate(prefix_chars):
+        group[f'prefix_hit_{i}'] = {'$max': {'$cond': [{'$eq': [{'$substrCP': ['$term', 0, 1]}, char]}, 1, 0]}}
+
+    # 每一项都必须命中
+    required = {'exact_hits': len(exact_terms)}
+    required.update({f'prefix_hit_{i}': 1 for i in range(len(prefix_chars))})
+
+    pipeline = [
+        {'$match': {'status': status, '$or': term_filter}},
+        {'$group': group},
+        {'$match': required}
+    ]
+
+    pipeline += [
+        {'$sort': {'score': -1}},
+        {'$limit': candidates},
+        {'$project': {'score': 1}}
+    ]
+
+    results = [(doc['_id'], doc['score']) for doc in db[TERMS_COLLECTION].aggregate(pipeline)]
+    if not results:
+        return []
+
+    # 候选结果中完整出现关键词的加分
+    lowered = keyword.lower()
+    phrase_ids = set()
+    if len(exact_terms) > 1:
+        ids = [announcement_id for announcement_id, _ in results]
+        for doc in db.announcements.find({'_id': {'$in': ids}}, {'title': 1, 'plain_text': 1}):
+            if lowered in doc.get('title', '').lower() or lowered in doc.get('plain_text', '').lower():
+                phrase_ids.add(doc['_id'])
+
+    ranked = sorted(
+        ((announcement_id, score + (PHRASE_BONUS if announcement_id in phrase_ids else 0))
+         for announcement_id, score in results),
+        key=lambda item: item[1],
+        reverse=True
+    )
+    return ranked[:limit]
+
+
+def _highlight_pattern(keyword):
+    """高亮用的正则：完整关键词优先，其次是切分出的各项"""
+    parts = [keyword] + [term for term, _ in query_terms(keyword) if term != keyword.lower()]
+    parts = sorted((part for part in parts if part), key=len, reverse=True)
+    if not parts:
+        return None
+    return re.compile('|'.join(re.escape(part) for part in parts), re.IGNORECASE)
+
+
+def highlight(text, keyword):
+    """转义文本并用 <mark> 标出关键词"""
+    pattern = _highlight_pattern((keyword or '').strip())
+    if pattern is None:
+        return escape(text)
+
+    result = []
+    last = 0
+    for match in pattern.finditer(text):
+        result.append(escape(text[last:match.start()]))
+        result.append(Markup('<mark>%s</mark>') % match.group())
+        last = match.end()
+    result.append(escape(text[last:]))
+    return Markup('').join(result)
+
+
+def snippet(text, keyword, length=SNIPPET_LENGTH):
+    """截取关键词附近的一段正文并高亮"""
+    text = text or ''
+    pattern = _highlight_pattern((keyword or '').strip())
+    match = pattern.search(text) if pattern else None
+
+    start = 0
+    if match:
+        start = max(0, match.start() - length // 3)
+    end = min(len(text), start + length)
+
+    fragment = highlight(text[start:end], keyword)
+    if start > 0:
+        fragment = Markup('...') + fragment
+    if end < len(text):
+        fragment = fragment + Markup('...')
+    return fragment
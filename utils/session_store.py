@@ -0,0 +1,248 @@
+"""
+服务端会话存储
+Cookie 中只保存随机会话ID，会话数据保存在服务端：
+- mongo：sessions 集合，expires_at 上的 TTL 索引自动清理过期会话，多节点共享
+- memory：进程内字典，用于测试和单节点运行
+
+只有会话数据确实发生变化、或过期时间的推移超过 SESSION_WRITE_THRESHOLD 秒时才写入存储并重新下发Cookie，
+避免每个请求都写库。
+
+登录和退出时更换会话ID并删除旧记录（防止会话固定攻击）；会话被清空时删除记录和Cookie。
+"""
+
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import session as current_session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from flask_login import user_logged_in, user_logged_out
+from werkzeug.datastructures import CallbackDict
+
+from utils.indexes import ensure_collection_indexes
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """服务端会话对象"""
+
+    def __init__(self, initial=None, sid=None, new=False, serialized=None, expires_at=None):
+        def on_update(session):
+            session.modified = True
+            session.accessed = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        # 更换会话ID后需要删除的旧ID
+        self.previous_sid = None
+        # 加载时的序列化内容和过期时间，保存时据此判断是否需要写入
+        self.serialized = serialized
+        self.expires_at = expires_at
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def regenerate(self):
+        """更换会话ID（保留数据），保存时删除旧记录并下发新Cookie"""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class MemorySessionStore:
+    """进程内会话存储（每 purge_interval 秒在写入时清理一次过期会话）"""
+
+    def __init__(self, purge_interval=60):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= datetime.utcnow():
+                del self._sessions[sid]
+                return None
+            return entry
+
+    def save(self, sid, serialized, expires_at):
+        with self._lock:
+            self._sessions[sid] = (serialized, expires_at)
+            if time.monotonic() >= self._next_purge:
+                self._purge_expired()
+
+    def _purge_expired(self):
+        now = datetime.utcnow()
+        for expired in [sid for sid, entry in self._sessions.items() if entry[1] <= now]:
+            del self._sessions[expired]
+        self._next_purge = time.monotonic() + self.purge_interval
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class MongoSessionStore:
+    """MongoDB会话存储"""
+
+    def __init__(self, mongo, collection='sessions'):
+        self.mongo = mongo
+        self.collection_name = collection
+        self._indexes_ready = False
+
+    @property
+    def collection(self):
+        return self.mongo.db[self.collection_name]
+
+    def ensure_indexes(self):
+        """TTL索引：到达 expires_at 后由MongoDB自动删除（定义见 utils/indexes.py）"""
+        ensure_collection_indexes(self.collection, 'sessions')
+        self._indexes_ready = True
+
+    def load(self, sid):
+        doc = self.collection.find_one({'_id': sid})
+        if doc is None:
+            return None
+        # TTL 清理由后台线程约每分钟执行一次，这里再判断一次
+        if doc['expires_at'] <= datetime.utcnow():
+            return None
+        return doc['data'], doc['expires_at']
+
+    def save(self, sid, serialized, expires_at):
+        # 首次写入时创建索引，避免导入应用时就连接数据库
+        if not self._indexes_ready:
+            self.ensure_indexes()
+        self.collection.update_one(
+            {'_id': sid},
+            {'$set': {'data': serialized, 'expires_at': expires_at}},
+            upsert=True
+        )
+
+    def delete(self, sid):
+        self.collection.delete_one({'_id': sid})
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """基于可插拔存储的会话接口"""
+
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSideSession
+
+    def __init__(self, store, write_threshold=60):
+        self.store = store
+        self.write_threshold = timedelta(seconds=write_threshold)
+
+    def _new_session(self):
+        return self.session_class(sid=secrets.token_urlsafe(32), new=True)
+
+    def _store_expiration(self, app, session):
+        """存储中的过期时间；非永久会话也按 PERMANENT_SESSION_LIFETIME 在服务端过期"""
+        return datetime.utcnow() + app.permanent_session_lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return self._new_session()
+
+        entry = self.store.load(sid)
+        if entry is None:
+            return self._new_session()
+
+        serialized, expires_at = entry
+        try:
+            data = self.serializer.loads(serialized)
+        except Exception:
+            return self._new_session()
+        return self.session_class(data, sid=sid, serialized=serialized, expires_at=expires_at)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+            if not session:
+                response.delete_cookie(name, domain=domain, path=path)
+
+        # 会话被清空：删除存储和Cookie
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        serialized = self.serializer.dumps(dict(session))
+        expires_at = self._store_expiration(app, session)
+
+        changed = session.new or serialized != session.serialized
+        expiry_moved = session.expires_at is None or expires_at - session.expires_at >= self.write_threshold
+        if not changed and not expiry_moved:
+            return
+
+        self.store.save(session.sid, serialized, expires_at)
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def _rotate_session(sender, **extra):
+    """登录、退出后更换会话ID"""
+    regenerate = getattr(current_session._get_current_object(), 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+
+
+def init_session_interface(app, mongo):
+    """根据 SESSION_BACKEND 配置安装会话接口（'cookie' 保持Flask默认的签名Cookie会话）"""
+    backend = app.config.get('SESSION_BACKEND', 'cookie')
+    if backend == 'cookie':
+        return None
+
+    if backend == 'mongo':
+        store = MongoSessionStore(mongo, app.config.get('SESSION_MONGO_COLLECTION', 'sessions'))
+    elif backend == 'memory':
+        store = MemorySessionStore()
+    else:
+        raise ValueError(f"未知的会话存储类型: {backend}")
+
+    app.session_interface = ServerSideSessionInterface(
+        store,
+        write_threshold=app.config.get('SESSION_WRITE_THRESHOLD', 60)
+    )
+    user_logged_in.connect(_rotate_session, app)
+    user_logged_out.connect(_rotate_session, app)
+    return store
@@ -0,0 +1,122 @@
+"""
+管理后台用户搜索
+原来按 {'$regex': 关键词, '$options': 'i'} 搜索用户名和邮箱，不区分大小写的非锚定正则无法使用索引，
+每次搜索都扫描整个 users 集合，且用户输入直接成为正则表达式。现在每个用户文档保存规范化的搜索键：
+- username_lower / email_lower：小写的用户名和邮箱，前缀查询用转义后的锚定正则（^前缀）走索引范围扫描
+- search_grams：用户名和完整邮箱（含域名）的三元组（trigram），子串查询要求关键词的每个三元组都存在（$all），
+  再用转义后的正则确认确实包含关键词；按域名搜索（如 example.com）同样走 search_grams 索引
+
+每次搜索最多取 MAX_RESULTS 个候选（另外保证完全匹配的用户在内），按完全匹配、前缀匹配、子串匹配和用户名排序后在内存中分页。
+搜索键在 User.create / User.update 时写入，旧数据由 database_upgrade.py 回填；
+search_version 记录计算搜索键的规则版本，规则变化时递增 SEARCH_VERSION，回填会重新计算旧版本的用户。
+"""
+
+import re
+
+from pymongo import UpdateOne
+
+GRAM_SIZE = 3
+MAX_RESULTS = 1000
+MAX_QUERY_LENGTH = 64
+SEARCH_VERSION = 2
+
+# 计算排名需要的字段
+RANK_PROJECTION = {'username_lower': 1, 'email_lower': 1}
+
+
+def normalize(text):
+    """规范化为搜索键：去掉首尾空白并转为小写"""
+    return (text or '').strip().lower()
+
+
+def grams(text):
+    """切分为三元组（去重），不足三个字符时返回空列表"""
+    return sorted({text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)})
+
+
+def search_fields(username, email):
+    """计算用户文档的搜索键字段"""
+    username_lower = normalize(username)
+    email_lower = normalize(email)
+    return {
+        'username_lower': username_lower,
+        'email_lower': email_lower,
+        'search_grams': sorted(set(grams(username_lower)) | set(grams(email_lower))),
+        'search_version': SEARCH_VERSION
+    }
+
+
+def build_query(keyword):
+    """根据关键词生成查询条件，关键词为空时返回 None"""
+    keyword = normalize(keyword)[:MAX_QUERY_LENGTH]
+    if not keyword:
+        return None
+
+    prefix = {'$regex': '^' + re.escape(keyword)}
+    branches = [{'username_lower': prefix}, {'email_lower': prefix}]
+
+    # 关键词至少三个字符才能按子串查找
+    # （$all 的每个三元组都可以用 search_grams 索引，查询计划器会选择命中最少的一个扫描）
+    if len(keyword) >= GRAM_SIZE:
+        contains = {'$regex': re.escape(keyword)}
+        branches.append({
+            'search_grams': {'$all': grams(keyword)},
+            '$or': [{'username_lower': contains}, {'email_lower': contains}]
+        })
+    return {'$or': branches}
+
+
+def _rank(user, keyword):
+    username = user.get('username_lower', '')
+    email = user.get('email_lower', '')
+    if keyword in (username, email):
+        match = 0
+    elif username.startswith(keyword) or email.startswith(keyword):
+        match = 1
+    else:
+        match = 2
+    return match, username
+
+
+def search_user_ids(db, keyword, filters=None, limit=MAX_RESULTS):
+    """返回匹配用户的 _id 列表（按相关度排序，最多 limit 个）"""
+    query = build_query(keyword)
+    if query is None:
+        return []
+    if filters:
+        query = {'$and': [query, filters]}
+
+    keyword = normalize(keyword)[:MAX_QUERY_LENGTH]
+    candidates = {user['_id']: user for user in db.users.find(query, RANK_PROJECTION).limit(limit)}
+
+    # 候选超过 limit 时完全匹配的用户可能不在其中，单独查一次（唯一索引，最多两条）
+    if len(candidates) >= limit:
+        exact = {'$or': [{'username_lower': keyword}, {'email_lower': keyword}]}
+        for user in db.users.find({'$and': [exact, filters]} if filters else exact, RANK_PROJECTION):
+            candidates[user['_id']] = user
+
+    ranked = sorted(candidates.values(), key=lambda user: _rank(user, keyword))
+    return [user['_id'] for user in ranked[:limit]]
+
+
+def fetch_users(db, user_ids, projection=None):
+    """按 user_ids 的顺序读取用户文档"""
+    users = {user['_id']: user for user in db.users.find({'_id': {'$in': list(user_ids)}}, projection)}
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+def backfill_search_fields(db, batch_size=1000):
+    """为缺少搜索键或搜索键版本较旧的用户重新计算搜索键，返回更新的用户数"""
+    total = 0
+    operations = []
+    cursor = db.users.find({'search_version': {'$ne': SEARCH_VERSION}},
+                           {'username': 1, 'email': 1}).batch_size(batch_size)
+    for user in cursor:
+        operations.append(UpdateOne({'_id': user['_id']},
+                                    {'$set': search_fields(user.get('username'), user.get('email'))}))
+        if len(operations) >= batch_size:
+            total += db.users.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        total += db.users.bulk_write(operations, ordered=False).modified_count
+    return total
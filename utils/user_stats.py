@@ -0,0 +1,61 @@
+"""
+用户统计
+用户总数及各类细分（已验证、未验证、管理员、激活、停用）的定义：
+- compute_user_stats：一次 $facet 聚合从 users 集合全量计算，用于校准计数器（utils/counters.py）
+- user_stat_names：单个用户计入哪些统计项，用于写入时增量维护计数器
+
+管理后台页面不直接聚合 users 集合，而是读取 counters 集合中的 'users' 文档。
+"""
+
+# 细分统计：字段 -> {字段值: 统计项名称}（与 count_documents({字段: 值}) 语义一致，缺失字段不计入）
+BREAKDOWNS = {
+    'email_verified': {True: 'verified', False: 'unverified'},
+    'is_admin': {True: 'admins'},
+    'is_active': {True: 'active', False: 'inactive'},
+}
+
+STAT_NAMES = ('total', 'verified', 'unverified', 'admins', 'active', 'inactive')
+
+
+def _stat_name(names, value):
+    # 只有布尔值才计入（1/0 与 True/False 在Python中相等，但查询 {字段: True} 不会匹配数字）
+    return names.get(value) if isinstance(value, bool) else None
+
+
+def user_stat_names(user):
+    """一个用户文档计入的统计项"""
+    stats = ['total']
+    for field, names in BREAKDOWNS.items():
+        name = _stat_name(names, user.get(field))
+        if name is not None:
+            stats.append(name)
+    return stats
+
+
+def user_stats_pipeline():
+    """一次扫描同时按各字段分组计数"""
+    facets = {'total': [{'$count': 'count'}]}
+    for field in BREAKDOWNS:
+        facets[field] = [{'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}]
+
+    return [
+        {'$project': {'_id': 0, **{field: 1 for field in BREAKDOWNS}}},
+        {'$facet': facets}
+    ]
+
+
+def compute_user_stats(collection):
+    """对 users 集合执行统计聚合，返回 {统计项: 数量}"""
+    result = next(collection.aggregate(user_stats_pipeline()), {})
+
+    stats = dict.fromkeys(STAT_NAMES, 0)
+    total = result.get('total')
+    if total:
+        stats['total'] = total[0]['count']
+
+    for field, names in BREAKDOWNS.items():
+        for group in result.get(field, []):
+            name = _stat_name(names, group['_id'])
+            if name is not None:
+                stats[name] = group['count']
+    return stats
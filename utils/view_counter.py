@@ -0,0 +1,160 @@
+"""
+公告查看次数缓冲
+详情页每次访问不再直接 $inc 写库，而是在进程内按公告累计增量：
+- 后台线程每 VIEW_COUNT_FLUSH_INTERVAL 秒用一次 bulk_write 把所有增量写入MongoDB，
+  累计次数达到 VIEW_COUNT_FLUSH_THRESHOLD 时提前唤醒后台线程写入；进程退出时再写入一次
+- 请求线程只修改内存中的计数，不执行任何数据库写入
+- VIEW_COUNT_WRITE_CONCERN 设为 0 时使用不确认写入（丢失少量计数可以接受时减少等待）
+
+详情页显示的次数 = 数据库（或读模型）中的次数 + 本进程尚未写入的增量。
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from pymongo.write_concern import WriteConcern
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """按文档聚合的计数缓冲"""
+
+    def __init__(self, collection='announcements', field='view_count',
+                 flush_interval=5, flush_threshold=100, write_concern=1):
+        self.collection_name = collection
+        self.field = field
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.write_concern = write_concern
+        self.app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = Counter()
+        self._pending_total = 0
+        self._flusher_pid = None
+        self.flushed = 0
+        self.failed_flushes = 0
+        self._listeners = []
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('VIEW_COUNT_FLUSH_INTERVAL', self.flush_interval)
+        self.flush_threshold = app.config.get('VIEW_COUNT_FLUSH_THRESHOLD', self.flush_threshold)
+        self.write_concern = app.config.get('VIEW_COUNT_WRITE_CONCERN', self.write_concern)
+        atexit.register(self.flush)
+
+    def add_listener(self, callback):
+        """注册写入成功后的回调 callback({文档ID字符串: 增量})，用于同步其他缓存"""
+        self._listeners.append(callback)
+
+    def _collection(self):
+        collection = self.app.mongo.db[self.collection_name]
+        return collection.with_options(write_concern=WriteConcern(w=self.write_concern))
+
+    def _ensure_flusher(self):
+        """在当前进程中启动定时写入线程（fork出的worker会各自启动）"""
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+
+        thread = threading.Thread(target=self._flush_periodically,
+                                  name='view-count-flusher', daemon=True)
+        thread.start()
+
+    def _flush_periodically(self):
+        while True:
+            # 到达间隔或被 increment 唤醒（累计次数达到阈值）时写入
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def increment(self, doc_id, amount=1):
+        """记录一次查看，返回调用前读取的文档之后该文档新增的查看次数（含本次）"""
+        self._ensure_flusher()
+        key = str(doc_id)
+
+        with self._lock:
+            self._pending[key] += amount
+            self._pending_total += amount
+            pending = self._pending[key]
+            due = self._pending_total >= self.flush_threshold
+
+        # 只通知后台线程写入，请求线程不写数据库
+        if due:
+            self._wake.set()
+        return pending
+
+    def pending(self, doc_id):
+        """尚未写入数据库的增量"""
+        with self._lock:
+            return self._pending.get(str(doc_id), 0)
+
+    def flush(self):
+        """把累计的增量一次性写入数据库，返回写入的文档数"""
+        if self.app is None:
+            return 0
+
+        # 同一时间只有一个线程写入，其余线程直接返回，增量留到下一次
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+
+        try:
+            with self._lock:
+                pending = self._pending
+                self._pending = Counter()
+                self._pending_total = 0
+
+            if not pending:
+                return 0
+
+            operations = [
+                UpdateOne({'_id': ObjectId(doc_id)}, {'$inc': {self.field: count}})
+                for doc_id, count in pending.items()
+            ]
+            try:
+                self._collection().bulk_write(operations, ordered=False)
+            except PyMongoError as e:
+                # 写入失败时放回缓冲区，下一次再试
+                logger.error(f"写入查看次数失败: {e}")
+                with self._lock:
+                    self._pending.update(pending)
+                    self._pending_total += sum(pending.values())
+                    self.failed_flushes += 1
+                return 0
+
+            with self._lock:
+                self.flushed += len(operations)
+            for callback in self._listeners:
+                callback(pending)
+            return len(operations)
+        finally:
+            self._flush_lock.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_documents': len(self._pending),
+                'pending_views': self._pending_total,
+                'flushed_documents': self.flushed,
+                'failed_flushes': self.failed_flushes,
+                'flush_interval': self.flush_interval,
+                'flush_threshold': self.flush_threshold,
+                'write_concern': self.write_concern
+            }
+
+
+# 全局公告查看次数缓冲
+view_counter = ViewCounterBuffer()